@@ -23,3 +23,10 @@
 ## end license ##
 
 from .jsonldwalk3 import *
+from .parallel import *
+from .jsonlines import *
+from .nodeindex import *
+from .sinks import *
+from .graphstream import *
+from .expand import *
+from .compact import *
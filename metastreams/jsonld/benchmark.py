@@ -0,0 +1,214 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+
+"""Benchmarks for walk() and its helpers on synthetic expanded JSON-LD.
+
+    python -m metastreams.jsonld.benchmark [--records N] [--save results.json]
+                                           [--compare previous.json]
+
+The records are generated from a fixed seed, so results of runs with the same
+parameters can be compared; --compare reports the ratio against a previous
+run and exits with status 1 when a benchmark got slower than --tolerance.
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+
+from .jsonldwalk3 import (
+    walk,
+    identity,
+    ignore_silently,
+    list2tuple,
+    tuple2list,
+    node_index,
+)
+
+schema = "http://schema.org/"
+
+
+def generate_records(n, width=20, depth=2, values=2, types=3, seed=42):
+    """n expanded JSON-LD records with width predicates per node, nested
+    depth levels deep, with up to values value objects per predicate and
+    @type taken from a mix of types types"""
+    random = Random(seed)
+    type_mix = [f"{schema}Type{i}" for i in range(types)]
+
+    def node(i, level):
+        n = {
+            "@id": f"urn:record:{i}:{level}:{random.randrange(1 << 30)}",
+            "@type": [random.choice(type_mix)],
+        }
+        for p in range(width):
+            if level < depth and p % 5 == 0:
+                n[f"{schema}p{p}"] = [node(i, level + 1)]
+            else:
+                n[f"{schema}p{p}"] = [
+                    {"@value": f"value {random.randrange(1000)}", "@language": "en"}
+                    for _ in range(random.randint(1, values))
+                ]
+        return n
+
+    return [node(i, 0) for i in range(n)]
+
+
+def dispatch_rules(width=20, depth=2):
+    """rule tables for generate_records() records with the same width and
+    depth, for each dispatch style"""
+
+    def nested(table, level=0):
+        rules = dict(table)
+        if level < depth:
+            for p in range(0, width, 5):
+                rules[f"{schema}p{p}"] = nested(table, level + 1)
+        return rules
+
+    plain = {"@id": identity, "@type": identity, "*": identity}
+    return {
+        "plain": nested(
+            {"@id": identity, "@type": identity}
+            | {f"{schema}p{p}": identity for p in range(width)}
+        ),
+        "default": nested(plain),
+        "ignore": nested({f"{schema}p1": identity, "*": ignore_silently}),
+        "all": nested(plain | {"__all__": lambda a, s, p, os: a}),
+        "key": nested(plain | {"__key__": lambda a, s, p, os: p}),
+        "switch": {
+            "__switch__": lambda a, s: s["@type"][0],
+            "*": nested(plain),
+        },
+    }
+
+
+def measure(fn, records, repeat=5):
+    """the best records/s of repeat runs of fn over records, and the memory
+    blocks and bytes allocated per record in one run"""
+    rates = []
+    gc.disable()  # collections at random moments make runs incomparable
+    try:
+        for _ in range(repeat):
+            t0 = perf_counter()
+            for record in records:
+                fn(record)
+            rates.append(len(records) / (perf_counter() - t0))
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = [fn(record) for record in records]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    allocated = sum(s.size_diff for s in stats if s.size_diff > 0)
+    blocks = sum(s.count_diff for s in stats if s.count_diff > 0)
+    del results
+    return {
+        "rate": max(rates),
+        "blocks": blocks / len(records),
+        "bytes": allocated / len(records),
+    }
+
+
+def run(records=2000, repeat=5, **params):
+    """runs all benchmarks, returning their results with the parameters"""
+    data = generate_records(records, **params)
+    results = {}
+    for name, rules in dispatch_rules(
+        params.get("width", 20), params.get("depth", 2)
+    ).items():
+        results[f"walk-{name}"] = measure(walk(rules), data, repeat)
+    frozen = [list2tuple(r) for r in data]
+    results["list2tuple"] = measure(list2tuple, data, repeat)
+    results["tuple2list"] = measure(tuple2list, frozen, repeat)
+    graphs = [{"@graph": data[i : i + 10]} for i in range(0, len(data), 10)]
+    results["node_index"] = measure(node_index, graphs, repeat)
+    return {
+        "params": {"records": records, "repeat": repeat} | params,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def compare(previous, current, tolerance=0.1):
+    """lines with the rate of current relative to previous, and whether any
+    benchmark is more than tolerance slower"""
+    lines, regressed = [], False
+    if previous["params"] != current["params"]:
+        lines.append(f"NB: different parameters: {previous['params']}")
+    for name, result in current["results"].items():
+        if name not in previous["results"]:
+            continue
+        ratio = result["rate"] / previous["results"][name]["rate"]
+        slower = ratio < 1 - tolerance
+        regressed = regressed or slower
+        lines.append(f"{name:>16}: {ratio:6.2f}x{'  SLOWER' if slower else ''}")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--values", type=int, default=2)
+    parser.add_argument("--types", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="compare with results from --save")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    current = run(
+        records=args.records,
+        repeat=args.repeat,
+        width=args.width,
+        depth=args.depth,
+        values=args.values,
+        types=args.types,
+        seed=args.seed,
+    )
+    print(f"{'benchmark':>16} {'records/s':>12} {'blocks/rec':>11} {'bytes/rec':>10}")
+    for name, r in current["results"].items():
+        print(f"{name:>16} {r['rate']:>12.0f} {r['blocks']:>11.1f} {r['bytes']:>10.0f}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            lines, regressed = compare(json.load(f), current, args.tolerance)
+        print("\n".join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+
+from .benchmark import generate_records, dispatch_rules, run, compare, main
+from .jsonldwalk3 import walk
+
+
+def test_generate_records():
+    records = generate_records(3, width=6, depth=1, values=2, types=2, seed=1)
+    assert records == generate_records(3, width=6, depth=1, values=2, types=2, seed=1)
+    assert records != generate_records(3, width=6, depth=1, values=2, types=2, seed=2)
+    r = records[0]
+    assert len(r) == 2 + 6
+    assert r["@type"][0] in ("http://schema.org/Type0", "http://schema.org/Type1")
+    nested = r["http://schema.org/p5"][0]
+    assert "http://schema.org/p5" not in nested["http://schema.org/p0"][0]
+    assert 1 <= len(r["http://schema.org/p1"]) <= 2
+    assert r["http://schema.org/p1"][0]["@language"] == "en"
+
+
+def test_dispatch_rules_walk_records():
+    records = generate_records(2, depth=2)
+    for name, rules in dispatch_rules(depth=2).items():
+        for record in records:
+            walk(rules)(record)
+    records = generate_records(2, width=26, depth=2)
+    for name, rules in dispatch_rules(width=26, depth=2).items():
+        for record in records:
+            walk(rules)(record)
+    plain = dispatch_rules(width=26, depth=2)["plain"]
+    assert type(plain["http://schema.org/p25"]["http://schema.org/p25"]) is dict
+    assert "http://schema.org/p26" not in plain
+
+
+def test_run_and_compare():
+    previous = run(records=5, repeat=1, width=5, depth=1)
+    assert set(previous["results"]) == {
+        "walk-plain",
+        "walk-default",
+        "walk-ignore",
+        "walk-all",
+        "walk-key",
+        "walk-switch",
+        "list2tuple",
+        "tuple2list",
+        "node_index",
+    }
+    assert previous["params"] == {"records": 5, "repeat": 1, "width": 5, "depth": 1}
+    result = previous["results"]["walk-plain"]
+    assert result["rate"] > 0 and result["blocks"] > 0 and result["bytes"] > 0
+
+    current = {
+        "params": previous["params"],
+        "results": {
+            "walk-plain": {"rate": 50.0},
+            "list2tuple": {"rate": 200.0},
+        },
+    }
+    previous["results"]["walk-plain"]["rate"] = 100.0
+    previous["results"]["list2tuple"]["rate"] = 100.0
+    lines, regressed = compare(previous, current)
+    assert regressed
+    assert lines == ["      walk-plain:   0.50x  SLOWER", "      list2tuple:   2.00x"]
+    assert compare(previous, current, tolerance=0.6)[1] is False
+
+
+def test_main(tmp_path, capsys):
+    saved = tmp_path / "results.json"
+    assert main(["--records", "3", "--repeat", "1", "--save", str(saved)]) == 0
+    assert saved.exists()
+    assert main(["--records", "3", "--repeat", "1", "--compare", str(saved)]) in (0, 1)
+    assert "walk-switch" in capsys.readouterr().out
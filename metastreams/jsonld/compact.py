@@ -0,0 +1,238 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from pyld import jsonld
+
+from .expand import Expander, SimpleContext, _Unsupported, _unset
+from .jsonldwalk3 import tuple2list
+
+""" Compaction of many expanded records, e.g. walk results, to one context,
+as jsonld.compact() does. The inverse context pyld builds for every call is
+built once here, for a SimpleContext; other contexts are left to pyld. """
+
+
+class Compactor:
+    """compacts expanded records like jsonld.compact(record, context). Lists
+    and tuples are both arrays, so frozen walk results need no tuple2list().
+    Remote contexts are loaded by expander, see Expander. Records or contexts
+    the fast path does not know are compacted by pyld."""
+
+    def __init__(self, context, expander=None, **kwargs):
+        self.context = context
+        self.expander = expander or Expander(**kwargs)
+        self.options = {
+            "documentLoader": self.expander.load_document,
+            "contextResolver": self.expander.options["contextResolver"],
+            "base": self.expander.options["base"],
+        }
+        local = context
+        if type(context) is dict and "@context" in context:
+            local = context["@context"]
+        output = [c for c in (local if type(local) is list else [local]) if c != {}]
+        self.output_context = output[0] if len(output) == 1 else output or None
+        self.simple = None
+        if not self.options["base"]:
+            try:
+                self.simple = SimpleContext(self.expander._local_contexts(local))
+            except _Unsupported:
+                pass
+        if self.simple is not None:
+            self.inverse = self._inverse()
+            self._curies = {}  # iri -> compact IRI
+
+    def _inverse(self):
+        """iri -> '@language'/'@type' -> value -> term, as pyld's inverse
+        context for terms without containers"""
+        default = self.simple.language or "@none"
+        inverse = {}
+        for term in sorted(self.simple.terms):  # as pyld's sort does
+            iri, type_, language = self.simple.terms[term]
+            entry = inverse.setdefault(iri, {"@language": {}, "@type": {}})
+            if type_ is not None:
+                entry["@type"].setdefault(type_, term)
+            elif language is not _unset:
+                entry["@language"].setdefault(language or "@null", term)
+            else:
+                entry["@language"].setdefault(default, term)
+                entry["@type"].setdefault("@none", term)
+                entry["@language"].setdefault("@none", term)
+        return inverse
+
+    def iri(self, iri, vocab):
+        """iri compacted to a term (when vocab), a compact IRI or itself"""
+        if type(iri) is not str:
+            raise _Unsupported(iri)
+        if vocab and iri in self.inverse:
+            return self._term(iri, "@type", "@id") or self.curie(iri)
+        return self.curie(iri)
+
+    def curie(self, iri):
+        """iri compacted to a compact IRI, or itself"""
+        compacted = self._curies.get(iri)
+        if compacted is not None:
+            return compacted
+        for prefix, prefix_iri in self.simple.prefixes.items():
+            if iri != prefix_iri and iri.startswith(prefix_iri):
+                curie = prefix + ":" + iri[len(prefix_iri) :]
+                if compacted is None or (len(curie), curie) < (
+                    len(compacted),
+                    compacted,
+                ):
+                    compacted = curie
+        if compacted is None:
+            prefix, colon, _ = iri.partition(":")
+            if not colon or not prefix or prefix in self.simple.prefixes:
+                raise _Unsupported(iri)  # relative, or confused with a prefix
+            compacted = iri
+        self._curies[iri] = compacted
+        return compacted
+
+    def _term(self, iri, type_or_language, value):
+        entry = self.inverse[iri][type_or_language]
+        return entry.get(value) or entry.get("@none")
+
+    def compact(self, expanded):
+        """the compacted form of expanded, a node or a list of nodes"""
+        if self.simple is not None:
+            try:
+                return self._compact(expanded)
+            except _Unsupported:
+                pass
+        if type(expanded) in (list, tuple):
+            expanded = [tuple2list(node) for node in expanded]
+        else:
+            expanded = tuple2list(expanded)
+        return jsonld.compact(expanded, self.context, self.options)
+
+    def compact_many(self, records):
+        """lazily compacts each of records"""
+        compact = self.compact
+        for record in records:
+            yield compact(record)
+
+    def _compact(self, expanded):
+        nodes = expanded if type(expanded) in (list, tuple) else (expanded,)
+        compacted = []
+        for node in nodes:
+            node = self.node(node)
+            if not node.keys() <= {"@id"}:  # not free floating
+                compacted.append(node)
+        if len(compacted) == 1:
+            compacted = compacted[0]
+        elif len(compacted) > 1:
+            compacted = {"@graph": compacted}
+        else:
+            compacted = {}
+        if self.output_context is None:
+            return compacted
+        return {"@context": self.output_context, **compacted}
+
+    def node(self, node):
+        if type(node) is not dict or "@value" in node:
+            raise _Unsupported(node)
+        result = {}
+        for p in sorted(node):
+            os = node[p]
+            if p == "@id":
+                result["@id"] = self.iri(os, vocab=False)
+            elif p == "@type":
+                if type(os) not in (list, tuple):
+                    raise _Unsupported(p)
+                types = [self.iri(t, vocab=True) for t in os]
+                if types:  # pyld expands the input again, dropping []
+                    result["@type"] = types[0] if len(types) == 1 else types
+            elif p.startswith("@") or type(os) not in (list, tuple):
+                raise _Unsupported(p)
+            else:
+                if not os:
+                    result.setdefault(self.iri(p, vocab=True), [])
+                for o in os:
+                    term, value = self.value(p, o)
+                    if term in result:
+                        values = result[term]
+                        if type(values) is not list:
+                            values = result[term] = [values]
+                        values.append(value)
+                    else:
+                        result[term] = value
+        return result
+
+    def value(self, p, o):
+        """the term for p and the compacted o"""
+        if type(o) is not dict:
+            raise _Unsupported(o)
+        if "@value" not in o:
+            if any(k.startswith("@") and k not in ("@id", "@type") for k in o):
+                raise _Unsupported(o)
+            term = self.iri(p, vocab=True)
+            if o.keys() != {"@id"}:
+                return term, self.node(o)
+            iri = self.iri(o["@id"], vocab=False)
+            definition = self.simple.terms.get(term)
+            if definition and definition[1] == "@id":
+                return term, iri
+            return term, {"@id": iri}
+
+        value = o["@value"]
+        language = o.get("@language")
+        type_ = o.get("@type")
+        if value is None or type(value) in (list, tuple, dict) or len(o) > 2:
+            raise _Unsupported(o)
+        if language is not None:
+            if type(language) is not str or type(value) is not str:
+                raise _Unsupported(o)
+            language = language.lower()
+            selection = ("@language", language)
+        elif type_ is not None:
+            selection = ("@type", type_)
+        elif len(o) > 1:
+            raise _Unsupported(o)
+        else:
+            selection = ("@language", "@null")
+        term = self._term(p, *selection) if p in self.inverse else None
+        term = term or self.curie(p)
+
+        default = self.simple.language
+        term_type, term_language = None, _unset
+        if term in self.simple.terms:
+            _, term_type, term_language = self.simple.terms[term]
+        if type_ is not None and type_ == term_type:
+            return term, value
+        if language is not None:
+            if language == (default if term_language is _unset else term_language):
+                return term, value
+            return term, {"@language": language, "@value": value}
+        if type_ is not None:
+            return term, {"@type": self.iri(type_, vocab=True), "@value": value}
+        if default is None or type(value) is not str or term_language is None:
+            return term, value
+        return term, {"@value": value}
+
+
+def compact_records(records, context, **kwargs):
+    """lazily compacts each of records with a fresh Compactor, see there"""
+    return Compactor(context, **kwargs).compact_many(records)
+
+
+__all__ = ["Compactor", "compact_records"]
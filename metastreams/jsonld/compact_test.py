@@ -0,0 +1,135 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from copy import deepcopy
+from random import Random
+from pyld import jsonld
+import pytest
+
+from .compact import Compactor, compact_records
+from .expand_test import simple
+
+S = "http://schema.org/"
+D = "http://purl.org/dc/terms/"
+XSD_INT = "http://www.w3.org/2001/XMLSchema#int"
+
+expanded = [
+    {"@id": "urn:a", "@type": [S + "Person"], S + "name": [{"@value": "A"}]},
+    {S + "name": [{"@value": "A", "@language": "nl"}, {"@value": 1}]},
+    {D + "title": [{"@value": "T", "@language": "en"}, {"@value": "U"}]},
+    {S + "code": [{"@value": "C"}], S + "count": [{"@value": 3, "@type": XSD_INT}]},
+    {S + "knows": [{"@id": "urn:b"}, {"@id": S + "c"}, {S + "name": []}]},
+    {S + "date": [{"@value": "2020", "@type": S + "Date"}]},
+    {"http://example.org/thing": [{"@id": "http://example.org/thing/x"}]},
+    {"urn:x": [{"@value": True, "@type": S + "Bool"}], S: [{"@id": "_:b"}]},
+    [{"@id": "urn:a", S + "name": [{"@value": "A"}]}, {"@id": "urn:b"}],
+    [{"@id": "urn:a", S + "name": [{"@value": "A"}]}, {S + "name": []}],
+    {"@id": "urn:a", "@type": []},
+    [],
+]
+
+
+def test_compact_as_pyld():
+    compactor = Compactor(simple)
+    for record in expanded:
+        compacted = jsonld.compact(deepcopy(record), simple)
+        assert compactor._compact(record) == compacted, record
+        assert compactor.compact(record) == compacted
+    assert list(compact_records(expanded, {"@context": simple})) == [
+        jsonld.compact(deepcopy(r), {"@context": simple}) for r in expanded
+    ]
+
+
+def test_compact_tuples():
+    record = {"@id": "urn:a", S + "name": ({"@value": "A"}, {"@value": "B"})}
+    assert Compactor(simple).compact(record) == {
+        "@context": simple,
+        "@id": "urn:a",
+        "name": [{"@value": "A"}, {"@value": "B"}],
+    }
+    vocab = {"@vocab": S}
+    assert Compactor(vocab).simple is None
+    assert Compactor(vocab).compact(record) == {
+        "@context": vocab,
+        "@id": "urn:a",
+        "name": ["A", "B"],
+    }
+
+
+def test_compact_falls_back():
+    records = [
+        {S + "name": [{"@list": [{"@value": "A"}]}]},
+        {S + "name": [{"@value": "A", "@index": "i"}]},
+        {"@id": "urn:a", "@reverse": {S + "knows": [{"@id": "urn:b"}]}},
+        {"@id": "rel", S + "name": [{"@value": "A"}]},
+    ]
+    compactor = Compactor(simple)
+    for record in records:
+        assert compactor.compact(record) == jsonld.compact(deepcopy(record), simple)
+    with pytest.raises(jsonld.JsonLdError, match="confused with prefix"):
+        compactor.compact({"s:name": [{"@value": "A"}]})
+
+    remote = Compactor("urn:simple", contexts={"urn:simple": {"@context": simple}})
+    assert remote.simple is not None
+    assert remote.compact(expanded[0]) == dict(
+        jsonld.compact(deepcopy(expanded[0]), simple), **{"@context": "urn:simple"}
+    )
+
+
+def test_compact_differential():
+    random = Random(24)
+    iris = [S + "name", S, D + "title", S + "knows", S + "code", S + "count"]
+    iris += [S + "date", S + "Person", "http://example.org/thing", "urn:x"]
+    languages = ["en", "nl", "de"]
+    types = [XSD_INT, S + "Date", S + "name"]
+
+    def node(depth):
+        result = {}
+        for p in random.sample(iris + ["@id", "@type"], random.randint(0, 4)):
+            if p == "@id":
+                result[p] = random.choice(iris + ["_:b"])
+            elif p == "@type":
+                result[p] = random.sample(iris, random.randint(0, 2))
+            else:
+                result[p] = [value(depth) for _ in range(random.randint(0, 3))]
+        return result
+
+    def value(depth):
+        choice = random.random()
+        if depth < 2 and choice < 0.15:
+            return node(depth + 1)
+        if choice < 0.3:
+            return {"@id": random.choice(iris)}
+        if choice < 0.5:
+            return {"@value": "v", "@language": random.choice(languages)}
+        if choice < 0.7:
+            return {"@value": random.choice([1, "v"]), "@type": random.choice(types)}
+        return {"@value": random.choice(["v", 1, 2.5, True])}
+
+    for context in (simple, {"s": S, "name": "s:name", "nm": "s:name"}):
+        compactor = Compactor(context)
+        for _ in range(500):
+            record = [node(0) for _ in range(random.randint(0, 2))]
+            compacted = jsonld.compact(deepcopy(record), context)
+            assert compactor._compact(record) == compacted, record
@@ -0,0 +1,371 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from hashlib import sha256
+from pathlib import Path
+import json
+
+from cachetools import LRUCache
+from pyld.context_resolver import ContextResolver
+from pyld.jsonld import JsonLdProcessor, JsonLdError
+
+from .jsonldwalk3 import hashable
+
+""" Expansion of many records with pyld, keeping what pyld only keeps for
+one call to jsonld.expand(): the resolved and processed contexts. Remote
+contexts come from memory or a directory, never from the network. Records
+with simple contexts, of prefixes and terms only, are expanded without pyld,
+see SimpleContext. """
+
+
+class _Unsupported(Exception):
+    """what SimpleContext leaves to pyld"""
+
+
+_unset = object()
+_gen_delims = frozenset(":/?#[]@")
+_value_keys = frozenset(("@value", "@language", "@type"))
+_term_keys = frozenset(("@id", "@language", "@type"))
+
+
+class SimpleContext:
+    """a context with only prefixes and terms mapping to IRIs, optionally
+    with a @type (@id or a datatype) or @language, and a default @language.
+    It expands records as pyld does, raising _Unsupported for anything it
+    does not know, so the caller can let pyld do it."""
+
+    def __init__(self, contexts=()):
+        self.language = None
+        self.prefixes = {}
+        self.terms = {}  # term -> (iri, @type, @language)
+        for context in contexts:
+            if type(context) is not dict:
+                raise _Unsupported(context)
+            self._define(context)
+
+    def _define(self, context):
+        for term, definition in context.items():
+            if term == "@language":
+                if type(definition) is not str:
+                    raise _Unsupported(term)
+                self.language = definition.lower()
+            elif term.startswith("@") or ":" in term:
+                raise _Unsupported(term)
+            elif type(definition) is str:
+                iri = self._context_iri(definition, context)
+                self.terms[term] = (iri, None, _unset)
+                if iri[-1] in _gen_delims:
+                    self.prefixes[term] = iri
+                else:
+                    self.prefixes.pop(term, None)
+            elif type(definition) is dict and definition.keys() <= _term_keys:
+                iri = definition.get("@id")
+                type_ = definition.get("@type")
+                language = definition.get("@language", _unset)
+                if type(iri) is not str:
+                    raise _Unsupported(term)
+                if type_ is not None and type_ != "@id":
+                    if type(type_) is not str or type_.startswith("@"):
+                        raise _Unsupported(term)
+                    type_ = self._context_iri(type_, context)
+                if type(language) is str:
+                    language = language.lower()
+                elif language is not None and language is not _unset:
+                    raise _Unsupported(term)
+                iri = self._context_iri(iri, context)
+                self.terms[term] = (iri, type_, language)
+                self.prefixes.pop(term, None)
+            else:
+                raise _Unsupported(term)
+
+    def _context_iri(self, iri, context):
+        """iri of a term definition; prefixes come from the context being
+        defined first, then from the ones before it"""
+        if iri.startswith("@"):
+            raise _Unsupported(iri)
+        prefix, colon, suffix = iri.partition(":")
+        if not colon:
+            raise _Unsupported(iri)  # a term or relative, needs @vocab
+        if prefix == "_" or suffix.startswith("//"):
+            return iri
+        if prefix in context:
+            definition = context[prefix]
+            if type(definition) is str and definition != iri:
+                expanded = self._context_iri(definition, context)
+                if expanded[-1] in _gen_delims:
+                    return expanded + suffix
+            elif definition is None or type(definition) is not str:
+                raise _Unsupported(iri)
+            return iri
+        if prefix in self.prefixes:
+            return self.prefixes[prefix] + suffix
+        return iri
+
+    def iri(self, iri, vocab):
+        """iri expanded, with terms when vocab; None for unknown terms"""
+        if vocab and iri in self.terms:
+            return self.terms[iri][0]
+        prefix, colon, suffix = iri.partition(":")
+        if colon:
+            if (
+                prefix in self.prefixes
+                and not suffix.startswith("//")
+                and prefix != "_"
+            ):
+                return self.prefixes[prefix] + suffix
+            return iri
+        if iri.startswith("@"):
+            raise _Unsupported(iri)
+        return None if vocab else iri
+
+    def expand(self, record):
+        """record expanded, as a list of nodes, as jsonld.expand() does"""
+        node = self.node(record)
+        if not node or node.keys() == {"@id"}:  # free floating
+            return []
+        return [node]
+
+    def node(self, element, nested=False):
+        result = {}
+        for key in sorted(element):
+            value = element[key]
+            if key == "@context":
+                if nested:  # scoped
+                    raise _Unsupported(key)
+            elif key == "@id":
+                if type(value) is not str:
+                    raise _Unsupported(key)
+                result["@id"] = self.iri(value, vocab=False)
+            elif key == "@type":
+                types = value if type(value) is list else [value]
+                if not all(type(t) is str for t in types):
+                    raise _Unsupported(key)
+                if types:  # pyld drops an empty @type
+                    result["@type"] = [self.iri(t, vocab=True) or t for t in types]
+            elif key.startswith("@") or key.startswith("_:"):
+                raise _Unsupported(key)
+            else:
+                p = self.iri(key, vocab=True)
+                if p is None or value is None:
+                    continue
+                term = self.terms.get(key)
+                values = result.setdefault(p, [])
+                for v in value if type(value) is list else (value,):
+                    if v is not None:
+                        values.append(self.value(v, term))
+        return result
+
+    def value(self, v, term):
+        if type(v) is dict:
+            if "@value" not in v:
+                if any(k.startswith("@") and k not in ("@id", "@type") for k in v):
+                    raise _Unsupported(v)
+                return self.node(v, nested=True)
+            if not v.keys() <= _value_keys:
+                raise _Unsupported(v)
+            value = v["@value"]
+            if value is None or type(value) in (list, dict):
+                raise _Unsupported(v)
+            if "@type" in v:
+                if "@language" in v or type(v["@type"]) is not str:
+                    raise _Unsupported(v)
+                type_ = self.iri(v["@type"], vocab=True)
+                if type_ is None or ":" not in type_:
+                    raise _Unsupported(v)  # pyld reports it
+                return {"@type": type_, "@value": value}
+            if "@language" in v:
+                if type(v["@language"]) is not str or type(value) is not str:
+                    raise _Unsupported(v)
+                return {"@value": value, "@language": v["@language"].lower()}
+            return {"@value": value}
+        if type(v) is list:
+            raise _Unsupported(v)
+        iri, type_, language = term or (None, None, _unset)
+        if type_ == "@id":
+            if type(v) is not str:
+                raise _Unsupported(v)
+            return {"@id": self.iri(v, vocab=False)}
+        if type_ is not None:
+            return {"@type": type_, "@value": v}
+        if type(v) is str:
+            if language is _unset:
+                language = self.language
+            if language is not None:
+                return {"@value": v, "@language": language}
+        return {"@value": v}
+
+
+class Expander:
+    """expands records like jsonld.expand(record, {"documentLoader": ...}).
+    Remote contexts are taken from contexts (url -> context document) or from
+    files in cache_dir, named by the sha256 of their url, see store(). The
+    active context is processed once per distinct @context of the records
+    and kept for the last active_contexts of those. With fast, records with
+    a SimpleContext are expanded without pyld; the others, and all records
+    when there is a base, are left to pyld."""
+
+    def __init__(
+        self, contexts=None, cache_dir=None, active_contexts=128, base="", fast=True
+    ):
+        self.contexts = dict(contexts or {})
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.processor = JsonLdProcessor()
+        self.options = {
+            "base": base,
+            "isFrame": False,
+            "keepFreeFloatingNodes": False,
+            "extractAllScripts": False,
+            "processingMode": "json-ld-1.1",
+            "documentLoader": self.load_document,
+        }
+        self.options["contextResolver"] = ContextResolver(
+            LRUCache(maxsize=active_contexts), self.load_document
+        )
+        # NB _get_initial_context() and _expand() are private to pyld, hence
+        # the << 2.1 pin in deps.txt; check them when upgrading pyld
+        self.initial = self.processor._get_initial_context(self.options)
+        self._active = LRUCache(maxsize=active_contexts)  # @context -> context
+        self._last = (None, self.initial)  # the last @context object seen
+        self.fast = fast and not base
+        self._simple = LRUCache(maxsize=active_contexts)  # @context -> simple
+        self._no_context = SimpleContext()
+        self._last_simple = (None, self._no_context)
+
+    def _path(self, url):
+        return self.cache_dir / (sha256(url.encode()).hexdigest() + ".json")
+
+    def store(self, url, document):
+        """keeps the document of url, in cache_dir when there is one"""
+        self.contexts[url] = document
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._path(url).write_text(json.dumps(document))
+
+    def load_document(self, url, options=None):
+        """the documentLoader for pyld"""
+        document = self.contexts.get(url)
+        if document is None and self.cache_dir is not None:
+            path = self._path(url)
+            if path.exists():
+                document = self.contexts[url] = json.loads(path.read_text())
+        if document is None:
+            raise JsonLdError(
+                f"No local copy of '{url}'",
+                "jsonld.LoadDocumentError",
+                {"url": url},
+                code="loading document failed",
+            )
+        return {"contextUrl": None, "documentUrl": url, "document": document}
+
+    def active_context(self, context):
+        """the active context for the @context of a record"""
+        last, active = self._last
+        if context is last:  # records of a batch sharing one @context
+            return active
+        if context is None:
+            return self.initial
+        key = hashable(context)
+        active = self._active.get(key)
+        if active is None:
+            active = self._active[key] = self.processor.process_context(
+                self.initial, context, self.options
+            )
+        self._last = (context, active)
+        return active
+
+    def _local_contexts(self, context, depth=0):
+        if type(context) is list:
+            for c in context:
+                yield from self._local_contexts(c, depth)
+        elif type(context) is str and depth < 8:
+            try:
+                document = self.load_document(context)["document"]
+            except JsonLdError:
+                raise _Unsupported(context)  # pyld reports it
+            if type(document) is not dict or "@context" not in document:
+                raise _Unsupported(context)
+            yield from self._local_contexts(document["@context"], depth + 1)
+        elif type(context) is dict:
+            yield context
+        else:
+            raise _Unsupported(context)
+
+    def simple_context(self, context):
+        """the SimpleContext for the @context of a record, or None"""
+        last, simple = self._last_simple
+        if context is last:
+            return simple
+        if context is None:
+            return self._no_context
+        key = hashable(context)
+        if key in self._simple:
+            simple = self._simple[key]
+        else:
+            try:
+                simple = SimpleContext(self._local_contexts(context))
+            except _Unsupported:
+                simple = None
+            self._simple[key] = simple
+        self._last_simple = (context, simple)
+        return simple
+
+    def expand(self, record):
+        """the expanded form of record, as a list of nodes"""
+        if self.fast and type(record) is dict:
+            simple = self.simple_context(record.get("@context"))
+            if simple is not None:
+                try:
+                    return simple.expand(record)
+                except _Unsupported:
+                    pass
+        if "@context" in record:
+            active = self.active_context(record["@context"])
+            record = {k: v for k, v in record.items() if k != "@context"}
+        else:
+            active = self.initial
+        # private to pyld, see __init__
+        expanded = self.processor._expand(
+            active, None, record, self.options, inside_list=False
+        )
+        # as jsonld.expand()
+        if isinstance(expanded, dict) and "@graph" in expanded and len(expanded) == 1:
+            expanded = expanded["@graph"]
+        elif expanded is None:
+            expanded = []
+        return expanded if isinstance(expanded, list) else [expanded]
+
+    def expand_many(self, records):
+        """lazily expands each of records; consecutive records with the same
+        @context share one processed context without looking it up"""
+        expand = self.expand
+        for record in records:
+            yield expand(record)
+
+
+def expand_records(records, contexts=None, cache_dir=None, **kwargs):
+    """lazily expands each of records with a fresh Expander, see there"""
+    return Expander(contexts, cache_dir, **kwargs).expand_many(records)
+
+
+__all__ = ["Expander", "expand_records"]
@@ -0,0 +1,177 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from copy import deepcopy
+from random import Random
+from pyld import jsonld
+import pytest
+
+from .expand import Expander, SimpleContext, expand_records
+
+context = {
+    "dcterms": "http://purl.org/dc/terms/",
+    "schema": "http://schema.org/",
+    "name": "schema:name",
+    "knows": {"@id": "schema:knows", "@type": "@id"},
+    "Person": {"@id": "schema:Person", "@context": {"name": "dcterms:title"}},
+}
+
+records = [
+    {"@context": context, "@id": "urn:a", "name": "A", "knows": ["urn:b"]},
+    {"@context": context, "@id": "urn:b", "@type": "Person", "name": "B"},
+    {"@context": deepcopy(context), "@graph": [{"@id": "urn:c", "name": "C"}]},
+    {"@context": [context, {"name": "dcterms:name"}], "name": "D"},
+    {"@id": "urn:e", "http://schema.org/name": "E"},
+    {"@context": context, "unknown": "dropped"},
+]
+
+
+def loader(url, options=None):
+    return {"contextUrl": None, "documentUrl": url, "document": {"@context": context}}
+
+
+def test_expand_as_pyld():
+    original = deepcopy(records)
+    expander = Expander()
+    assert list(expander.expand_many(records)) == [jsonld.expand(r) for r in records]
+    assert records == original
+    assert len(expander._active) == 2  # context and [context, {...}]
+
+
+def test_remote_contexts(tmp_path):
+    remote = [dict(r, **{"@context": "urn:ctx"}) for r in records[:3]]
+    expected = [jsonld.expand(r, {"documentLoader": loader}) for r in remote]
+    expander = Expander({"urn:ctx": {"@context": context}})
+    assert list(expander.expand_many(remote)) == expected
+
+    with pytest.raises(jsonld.JsonLdError) as e:
+        Expander().expand(remote[0])
+    assert "No local copy of 'urn:ctx'" in str(e.value.details["cause"])
+
+    Expander(cache_dir=tmp_path).store("urn:ctx", {"@context": context})
+    assert list(expand_records(remote, cache_dir=tmp_path)) == expected
+
+
+simple = {
+    "s": "http://schema.org/",
+    "d": "http://purl.org/dc/terms/",
+    "@language": "NL",
+    "name": "s:name",
+    "title": {"@id": "d:title", "@language": "EN"},
+    "code": {"@id": "s:code", "@language": None},
+    "knows": {"@id": "s:knows", "@type": "@id"},
+    "count": {"@id": "s:count", "@type": "http://www.w3.org/2001/XMLSchema#int"},
+    "date": {"@id": "s:date", "@type": "s:Date"},
+    "Person": "s:Person",
+    "thing": "http://example.org/thing",
+}
+
+simple_records = [
+    {"@context": simple, "@id": "urn:a", "@type": "Person", "name": "A"},
+    {"@context": simple, "title": "T", "code": "C", "count": 3, "date": "2020"},
+    {"@context": simple, "knows": ["urn:b", "s:c", "rel"], "name": [1, True, 2.5]},
+    {"@context": simple, "@id": "rel", "@type": ["Rel", "s:T"], "unknown": "x"},
+    {"@context": simple, "thing:x": 1, "x:y": 2, "s://z": 3},
+    {"@context": simple, "name": {"@value": "v", "@language": "DE"}},
+    {"@context": simple, "name": {"@value": 1, "@type": "s:Int"}, "code": None},
+    {"@context": simple, "name": [None], "title": [], "knows": {"name": "n"}},
+    {"@context": simple, "@id": "urn:a"},
+    {"@context": simple, "name": [{}, {"@id": "urn:b"}, {"knows": "urn:c"}]},
+    {"@context": [simple, {"s": "http://other.org/", "other": "s:o"}], "other": 1},
+]
+
+unsupported = [
+    {"@context": simple, "_:b": "blank node property"},
+    {"@context": simple, "@graph": [{"@id": "urn:a", "name": "A"}]},
+    {"@context": simple, "name": {"@list": ["a", "b"]}},
+    {"@context": simple, "name": {"@context": {"name": "d:name"}, "name": "n"}},
+    {"@context": {"@vocab": "http://schema.org/"}, "name": "n"},
+    {"@context": {"type": "@type"}, "type": "urn:t"},
+    {"@context": {"list": {"@id": "urn:l", "@container": "@list"}}, "list": [1]},
+]
+
+
+def test_simple_context():
+    expander = Expander()
+    for record in simple_records:
+        assert expander.expand(record) == jsonld.expand(deepcopy(record)), record
+    assert len(expander._active) == 0  # pyld did not process any context
+    for record in unsupported:
+        assert expander.expand(record) == jsonld.expand(deepcopy(record)), record
+    assert len(expander._active) == 4
+    document = [{"http://schema.org/name": "A"}, {"@id": "urn:b", "@type": "urn:t"}]
+    assert expander.expand(document) == jsonld.expand(deepcopy(document))
+
+    with pytest.raises(jsonld.JsonLdError):
+        Expander().expand({"@context": simple, "name": {"@value": "v", "@type": "R"}})
+
+    remote = [dict(r, **{"@context": "urn:simple"}) for r in simple_records[:3]]
+    expander = Expander({"urn:simple": {"@context": simple}})
+    expected = [expander.expand(dict(r, **{"@context": simple})) for r in remote]
+    assert list(expander.expand_many(remote)) == expected
+    assert len(expander._active) == 0
+
+
+def test_simple_context_earlier_prefixes():
+    contexts = [{"s": "http://a.org/", "n": "s:n"}, {"s": "http://b.org/", "o": "s:o"}]
+    record = {"@context": contexts, "n": 1, "o": 2, "s:p": 3}
+    assert SimpleContext(contexts).expand(record) == jsonld.expand(record)
+    for record in (
+        {"@context": simple, "@id": "urn:a", "@type": [], "s:n": "x"},
+        {"@context": simple, "s:n": {"@type": []}},
+    ):
+        assert SimpleContext([simple]).expand(record) == jsonld.expand(record)
+    assert Expander(base="http://base.org/").fast is False
+    assert Expander(fast=False).simple_context(simple) is not None
+
+
+def test_simple_context_differential():
+    random = Random(23)
+    keys = ["name", "title", "code", "knows", "count", "date", "thing", "Person"]
+    keys += ["s:p", "x:y", "unknown", "http://example.org/p", "@id", "@type"]
+    values = ["a", "urn:x", "s:v", "Person", "rel", "_:b1", 1, 2.5, True, None]
+    values += [[], [None], {}, {"@value": "v", "@language": "EN"}, {"@value": 3}]
+
+    def node(depth):
+        result = {}
+        for key in random.sample(keys, random.randint(0, 5)):
+            if key == "@id":
+                result[key] = random.choice(["urn:a", "rel", "s:i", "_:b2"])
+            elif key == "@type":
+                result[key] = random.choice(["Person", "s:T", ["Rel", "x:y"], []])
+            else:
+                result[key] = value(depth)
+        return result
+
+    def value(depth):
+        if depth < 2 and random.random() < 0.2:
+            return node(depth + 1)
+        if random.random() < 0.2:
+            return [value(depth + 1) for _ in range(random.randint(0, 3))]
+        return deepcopy(random.choice(values))
+
+    expander = Expander()
+    for _ in range(1000):
+        record = dict(node(0), **{"@context": simple})
+        assert expander.expand(record) == jsonld.expand(deepcopy(record)), record
@@ -0,0 +1,149 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from codecs import getincrementaldecoder
+import json
+import re
+
+from .jsonldwalk3 import walk_many
+from .jsonlines import open_jsonlines
+
+""" Reads the nodes of the @graph of one (huge) JSON-LD document one at a
+time, keeping only the node being parsed in memory, so they can be walked as
+soon as they are complete, see walk_graph(). """
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+_raw_decode = json.JSONDecoder().raw_decode
+
+
+class _Buffer:
+    """the text of a stream from pos; read() appends, dropping the text
+    before pos, so it holds about the value being decoded"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def read(self, size):
+        data = self.f.read(size)
+        self.eof = not data
+        self.text = self.text[self.pos :] + self.decoder.decode(data, final=self.eof)
+        self.pos = 0
+
+    def peek(self):
+        """the next character that is not whitespace, or '' at the end"""
+        while True:
+            self.pos = _whitespace.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if self.eof:
+                return ""
+            self.read(self.chunk_size)
+
+    def expect(self, c):
+        found = self.peek()
+        if found != c:
+            raise ValueError(f"Expected '{c}', got '{found}' at {self.where()}")
+        self.pos += 1
+
+    def decode(self):
+        """the JSON value at pos; reads more, twice as much each time, until it
+        is complete, so a value is parsed in time linear to its size"""
+        size = self.chunk_size
+        self.peek()
+        while True:
+            try:
+                value, end = _raw_decode(self.text, self.pos)
+                if end < len(self.text) or self.eof:  # numbers may continue
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read(size)
+            size *= 2
+
+    def where(self):
+        return f"'{self.text[self.pos:self.pos + 20]}'"
+
+
+def read_graph(path, chunk_size=1 << 16, members=None):
+    """yields the nodes in the @graph of the JSON-LD document in path (gzip
+    compressed or not) one at a time. A document that is a list yields its
+    items and a single node itself. The other members of the document, like
+    @context, are put in members when given."""
+    with open_jsonlines(path, "rb") as f:
+        buffer = _Buffer(f, chunk_size)
+        c = buffer.peek()
+        if c == "[":
+            yield from _read_list(buffer)
+        elif c == "{":
+            buffer.pos += 1
+            node = {}  # for a document without @graph
+            graph = False
+            while buffer.peek() != "}":
+                if node or graph:
+                    buffer.expect(",")
+                key = buffer.decode()
+                buffer.expect(":")
+                if key == "@graph":
+                    graph = True
+                    if buffer.peek() == "[":
+                        yield from _read_list(buffer)
+                    else:
+                        yield buffer.decode()
+                    continue
+                node[key] = buffer.decode()
+                if members is not None:
+                    members[key] = node[key]
+            if not graph:
+                yield node
+        else:
+            raise ValueError(f"Expected a JSON-LD document, got {buffer.where()}")
+
+
+def _read_list(buffer):
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        buffer.pos += 1
+        return
+    while True:
+        yield buffer.decode()
+        if buffer.peek() == "]":
+            buffer.pos += 1
+            return
+        buffer.expect(",")
+
+
+def walk_graph(rules, path, chunk_size=1 << 16, **opts):
+    """walks the nodes of the @graph in the JSON-LD document in path as
+    they are read, yielding the results; opts are as for walk_many()"""
+    return walk_many(rules, read_graph(path, chunk_size), **opts)
+
+
+__all__ = ["read_graph", "walk_graph"]
@@ -0,0 +1,95 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+import gzip
+import json
+import pytest
+
+from .jsonldwalk3 import identity
+from . import graphstream
+from .graphstream import read_graph, walk_graph
+
+graph = [{"@id": f"id:{i}", "v": [i, -1.5e3, "ü" * i, None, True]} for i in range(50)]
+
+
+def test_read_graph(tmp_path):
+    doc = {"@context": {"v": "urn:v"}, "@graph": graph, "after": [12345]}
+    (tmp_path / "doc.json").write_text(json.dumps(doc, indent=2, ensure_ascii=False))
+    members = {}
+    for chunk_size in (1, 7, 1 << 16):
+        nodes = read_graph(
+            tmp_path / "doc.json", chunk_size=chunk_size, members=members
+        )
+        assert list(nodes) == graph
+    assert members == {"@context": {"v": "urn:v"}, "after": [12345]}
+
+    with gzip.open(tmp_path / "doc.json.gz", "wt") as f:
+        json.dump(doc, f)
+    assert list(read_graph(tmp_path / "doc.json.gz", chunk_size=100)) == graph
+
+
+def test_other_documents(tmp_path):
+    def read(doc, **kwargs):
+        (tmp_path / "doc.json").write_text(doc)
+        return list(read_graph(tmp_path / "doc.json", chunk_size=3, **kwargs))
+
+    assert read(json.dumps(graph)) == graph
+    assert read('{"@id": "a", "v": [1]}') == [{"@id": "a", "v": [1]}]
+    assert read('{"@graph": {"@id": "a"}}') == [{"@id": "a"}]
+    assert read(' { "@graph" : [ ] } ') == []
+    assert read("[]") == []
+    assert read("[1234, 5]") == [1234, 5]  # numbers are not cut at a chunk
+    with pytest.raises(ValueError):
+        read('"a"')
+    with pytest.raises(ValueError):
+        read('{"@graph": [{"@id": "a"} {"@id": "b"}]}')
+    with pytest.raises(json.JSONDecodeError):
+        read('{"@graph": [{"@id": "a"')
+
+
+def test_bounded_buffer(tmp_path, monkeypatch):
+    big = {"@id": "big", "v": ["x" * 10000]}
+    (tmp_path / "doc.json").write_text(json.dumps({"@graph": graph + [big] + graph}))
+    sizes = []
+    read = graphstream._Buffer.read
+
+    def tracking_read(self, size):
+        read(self, size)
+        sizes.append(len(self.text))
+
+    monkeypatch.setattr(graphstream._Buffer, "read", tracking_read)
+    assert (
+        list(read_graph(tmp_path / "doc.json", chunk_size=64)) == graph + [big] + graph
+    )
+    assert max(sizes) < 3 * len(json.dumps(big))
+
+
+def test_walk_graph(tmp_path):
+    (tmp_path / "doc.json").write_text(json.dumps({"@graph": graph}))
+    results = walk_graph(
+        {"@id": identity, "v": lambda a, s, p, os, n=0: a | {"n": os[0] + n}},
+        tmp_path / "doc.json",
+        n=1,
+    )
+    assert list(results) == [{"@id": f"id:{i}", "n": i + 1} for i in range(50)]
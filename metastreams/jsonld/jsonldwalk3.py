@@ -26,8 +26,18 @@ from inspect import isfunction, currentframe
 from operator import attrgetter
 from functools import reduce
 from pprint import pformat
+from reprlib import Repr
+from textwrap import indent
 from copy import copy
+from collections import OrderedDict
+from weakref import WeakValueDictionary
+from time import perf_counter
+import builtins
+import json
+import linecache
+import re
 import sys
+from sys import intern
 
 """
          13669367 function calls (10903180 primitive calls) in 3.850 seconds
@@ -74,101 +84,903 @@ def trace(locals_from_stack):
 
 
 def locals_with_key():
-    return [
-        fl
-        for fl in (
-            tb.tb_frame.f_locals
-            for tb in iterate(attrgetter("tb_next"), sys.exc_info()[2])
+    found = []
+    for tb in iterate(attrgetter("tb_next"), sys.exc_info()[2]):
+        fl = tb.tb_frame.f_locals
+        if "__key__" in fl:
+            found.append(fl)
+        elif "__stack__" in fl:  # explicit stack of walk_stack()
+            found.extend(stack_locals(fl["__stack__"]))
+    return found
+
+
+# Python source templates for handle, see _handle_source()
+_ALL_RULE = """
+    accu = all_rule(accu, subject, predicate, objects{opts})"""
+
+_DISPATCH_LOOP = """
+    for subject in objects:
+        for __key__ in subject:
+            {apply}"""
+
+# only the predicates there are rules for, in the order of the subject
+_SPARSE_LOOP = """
+    for subject in objects:
+        for __key__ in filter(wanted, subject):
+            {apply}"""
+
+_KEY_LOOP = """
+    for subject in objects:
+        for predicate in subject:
+            objects = subject[predicate]
+            __key__ = key_fn(accu, subject, predicate, objects)
+            {apply}"""
+
+_SWITCH_LOOP = """
+    for subject in objects:
+        __key__ = switch_fn(accu, subject)
+        accu = get(__key__, default)(accu, None, None, (subject,){opts})"""
+
+# "__switch__": "@type", with what combinations of @types resolve to cached;
+# a single type is the key itself
+_TYPE_SWITCH_LOOP = """
+    for subject in objects:
+        try:
+            types = subject["@type"]
+        except KeyError:
+            types = ()
+        if len(types) == 1:
+            __key__ = types[0]
+        else:
+            __key__ = resolved(tuple(types))
+            if __key__ is None:
+                __key__ = switch_fn(accu, subject)
+        accu = get(__key__, default)(accu, None, None, (subject,){opts})"""
+
+_FINALIZE = """
+    accu = finalize(accu{opts})"""
+
+# inlined rules by kind: the test selecting them and what they do
+_INLINE = {
+    "ignore": ("rule is ignore_silently", "pass"),
+    "identity": ("rule is identity", "accu[{p}] = {os}"),
+    "rename": ("kind is Rename", "accu[rule.p] = {os}"),
+    "first_value": ("kind is FirstValue", 'accu[rule.p] = {os}[0]["@value"]'),
+    "collect": (
+        "kind is Collect",
+        """values = accu.get(rule.p)
+if values.__class__ is Collected and rule.normalize is None:
+    values.extend({os})
+else:
+    accu = rule(accu, subject, {p}, {os}{opts})""",
+    ),
+    "nest_into": (
+        "kind is NestInto",
+        """nested = rule.handle
+accu[{p} if rule.p is None else rule.p] = [
+    nested({}, None, None, (o,){opts}) for o in {os}
+]""",
+    ),
+}
+
+
+def _inline_kind(rule):
+    if rule is ignore_silently:
+        return "ignore"
+    if rule is identity:
+        return "identity"
+    if isinstance(rule, Rule) and rule.kind in _INLINE:
+        # nested handles of refs are linked after generating the handle
+        if rule.kind != "nest_into" or rule.handle or type(rule.rules) is Ref:
+            return rule.kind
+    return None
+
+
+def _apply_source(lookup, kinds, p, os):
+    """source applying the rule found with lookup to predicate p and objects os;
+    rules of the given kinds are inlined"""
+    call = f"accu = rule(accu, subject, {p}, {os}{{opts}})"
+    if not kinds:
+        lines = [call.replace("rule", lookup, 1)]
+    elif lookup == "default":  # the one rule there is, no need to test it
+        (kind,) = kinds
+        lines = ["rule = default", _INLINE[kind][1]]
+    else:
+        lines = [f"rule = {lookup}"]
+        if any(_INLINE[kind][0].startswith("kind ") for kind in kinds):
+            lines.append("kind = rule.__class__")
+        for n, kind in enumerate(kinds):
+            test, body = _INLINE[kind]
+            lines.append(f"{'elif' if n else 'if'} {test}:")
+            lines.append(indent(body, "    "))
+        lines += ["else:", "    " + call]
+    source = "\n".join(lines).replace("{p}", p).replace("{os}", os)
+    return source.replace("\n", "\n" + 12 * " ")
+
+
+def _shape_source(shape_kinds):
+    """straight-line source applying the rules to the predicates of a subject
+    of a known shape, r0 to k0 etc, inlining rules of the given kinds"""
+    lines = ["if tuple(subject) == shape:"]
+    for n, kind in enumerate(shape_kinds):
+        if kind == "ignore":
+            continue
+        p, os = f"k{n}", f"subject[k{n}]"
+        lines.append(f"    __key__ = {p}")
+        if kind == "call":
+            lines.append(f"    accu = r{n}(accu, subject, {p}, {os}{{opts}})")
+        else:
+            body = _INLINE[kind][1].replace("{p}", p).replace("{os}", os)
+            if "rule" in body:
+                lines.append(f"    rule = r{n}")
+            lines.append(indent(body, "    "))
+    lines.append("    continue")
+    return indent("\n".join(lines), 8 * " ")
+
+
+def _handle_source(rules, shape_kinds=()):
+    """generates the source of a handle specialized for the shape of rules,
+    and for subjects with the shape of shape_kinds, see Profile.hot_shapes()"""
+    unpack = ""
+    kinds = sorted(
+        {_inline_kind(r) for k, r in rules.items() if k not in _specials} - {None}
+    )
+    if "__key__" in rules:
+        variant = "key"
+        loop = _KEY_LOOP.replace(
+            "{apply}",
+            _apply_source("get(__key__, default)", kinds, "predicate", "objects"),
         )
-        if "__key__" in fl
-    ]
+    elif rules.get("__switch__") == "@type":
+        variant, loop, kinds = "typeswitch", _TYPE_SWITCH_LOOP, []
+        unpack = "    resolved = switch_fn.cache.get\n"
+    elif "__switch__" in rules:
+        variant, loop, kinds = "switch", _SWITCH_LOOP, []
+    elif rules.get("*") is ignore_silently:
+        variant = "sparse"
+        kinds = sorted(
+            {
+                _inline_kind(r)
+                for k, r in rules.items()
+                if k not in _specials and k != "*"
+            }
+            - {None}
+        )
+        loop = _SPARSE_LOOP.replace(
+            "{apply}",
+            _apply_source(
+                "get(__key__, default)", kinds, "__key__", "subject[__key__]"
+            ),
+        )
+    elif rules.keys() == {"*"}:
+        variant = "default"
+        loop = _DISPATCH_LOOP.replace(
+            "{apply}", _apply_source("default", kinds, "__key__", "subject[__key__]")
+        )
+    else:
+        variant = "dispatch"
+        loop = _DISPATCH_LOOP.replace(
+            "{apply}",
+            _apply_source(
+                "get(__key__, default)", kinds, "__key__", "subject[__key__]"
+            ),
+        )
+    if kinds:
+        variant += f"[{','.join(kinds)}]"
+    if shape_kinds:
+        variant += f"+shape[{','.join(shape_kinds)}]"
+        loop = loop.replace(
+            "    for subject in objects:",
+            "    for subject in objects:\n" + _shape_source(shape_kinds),
+            1,
+        )
+        keys = ", ".join(f"k{n}" for n in range(len(shape_kinds)))
+        unpack = f"    {keys}, = shape\n    {keys.replace('k', 'r')}, = shape_rules\n"
+    if "__all__" in rules:
+        variant, loop = variant + "+all", _ALL_RULE + loop
+    if "__finalize__" in rules:
+        variant, loop = variant + "+finalize", loop + _FINALIZE
+    # calling with **opts is costly, so we only do that when there are opts
+    handle = (
+        "def handle(accu, subject, predicate, objects, **opts):\n"
+        "    if opts:"
+        + indent(loop.replace("{opts}", ", **opts"), "    ")
+        + "\n        return accu"
+        + loop.replace("{opts}", "")
+        + "\n    return accu\n"
+    )
+    return variant, (
+        "def make_handle(\n"
+        "    get, default, all_rule, key_fn, switch_fn, finalize, wanted, shape, shape_rules\n"
+        "):\n" + unpack + indent(handle, "    ") + "    return handle\n"
+    )
 
 
-def compile(rules):
+def type_switch(rules):
+    """the switch_fn for "__switch__": "@type": the first key in rules that is
+    one of the @types of the subject, so the order of rules is the priority
+    when a node has more types, else its first type. What a combination of
+    @types resolves to is cached, in switch_fn.cache."""
+    priority = [k for k in rules if k not in _specials and k != "*"]
+    cache = {}
+
+    def switch_fn(accu, subject):
+        types = subject.get("@type", ())
+        if type(types) is str:  # compacted
+            return types
+        for key in priority:
+            if key in types:
+                break
+        else:
+            key = types[0] if types else None
+        if len(cache) < 4096:
+            cache[tuple(types)] = key
+        return key
+
+    switch_fn.cache = cache
+    return switch_fn
+
+
+def _switch_fn(rules):
+    switch = rules.get("__switch__")
+    if type(switch) is str:
+        if switch != "@type":
+            raise ValueError(
+                f"Expected a function or '@type' for __switch__: {switch!r}"
+            )
+        return type_switch(rules)
+    return switch
+
+
+_specials = frozenset(
+    ("__all__", "__key__", "__switch__", "__finalize__", "__name__", "__memo__")
+)
+
+
+_handle_makers = {}
+
+
+def _handle_maker(rules, shape_kinds=()):
+    """compiles (once) and returns the factory for the handle variant rules needs"""
+    return _make_handle_maker(*_handle_source(rules, shape_kinds))
+
+
+def _make_handle_maker(variant, source):
+    if variant not in _handle_makers:
+        filename = f"<jsonldwalk3 handle {variant}>"
+        # register the source so tracebacks show the generated lines
+        linecache.cache[filename] = (
+            len(source),
+            None,
+            source.splitlines(True),
+            filename,
+        )
+        namespace = {
+            "identity": identity,
+            "ignore_silently": ignore_silently,
+            "Rename": Rename,
+            "FirstValue": FirstValue,
+            "Collect": Collect,
+            "Collected": Collected,
+            "NestInto": NestInto,
+            "_FanNested": _FanNested,
+        }
+        exec(builtins.compile(source, filename, "exec"), namespace)
+        _handle_makers[variant] = namespace["make_handle"]
+    return _handle_makers[variant]
+
+
+# walks several tables in one traversal, with a list of their accus as accu;
+# get gives the pairs of the index of a table and its rule for a predicate
+_FAN_LOOP = """
+    for subject in objects:
+        for __key__ in {keys}:
+            os = subject[__key__]
+            for n, rule in get(__key__, default):
+                {apply}"""
+
+_FAN_ALL = """
+    for n, rule in alls:
+        accu[n] = rule(accu[n], subject, predicate, objects{opts})"""
+
+_FAN_FINALIZE = """
+    for n, rule in finalizes:
+        accu[n] = rule(accu[n]{opts})"""
+
+
+def _fan_source(kinds, sparse, nested, all_, finalize):
+    """generates the source of a handle walking several tables in one
+    traversal, inlining rules of the given kinds; nested for pairs with a
+    _FanNested, which gets the accus of all tables"""
+    kinds = sorted(kinds)
+    lines = []
+    if nested or any(_INLINE[kind][0].startswith("kind ") for kind in kinds):
+        lines.append("kind = rule.__class__")
+    for n, kind in enumerate(kinds):
+        test, body = _INLINE[kind]
+        body = body.replace("{p}", "__key__").replace("{os}", "os")
+        lines.append(f"{'elif' if n else 'if'} {test}:")
+        lines.append(indent(re.sub(r"\baccu\b", "accu[n]", body), "    "))
+    if nested:  # updates the accus of all tables
+        lines.append(f"{'elif' if kinds else 'if'} kind is _FanNested:")
+        lines.append("    accu = rule(accu, subject, __key__, os{opts})")
+    call = "accu[n] = rule(accu[n], subject, __key__, os{opts})"
+    lines += ["else:", "    " + call] if kinds or nested else [call]
+    apply = "\n".join(lines)
+    loop = _FAN_LOOP.replace(
+        "{keys}", "filter(wanted, subject)" if sparse else "subject"
+    )
+    loop = loop.replace("{apply}", apply.replace("\n", "\n" + 16 * " "))
+    variant = f"fan[{','.join(kinds)}]"
+    if sparse:
+        variant += "+sparse"
+    if nested:
+        variant += "+nested"
+    if all_:
+        variant, loop = variant + "+all", _FAN_ALL + loop
+    if finalize:
+        variant, loop = variant + "+finalize", loop + _FAN_FINALIZE
+    handle = (
+        "def handle(accu, subject, predicate, objects, **opts):\n"
+        "    if opts:"
+        + indent(loop.replace("{opts}", ", **opts"), "    ")
+        + "\n        return accu"
+        + loop.replace("{opts}", "")
+        + "\n    return accu\n"
+    )
+    return variant, (
+        "def make_handle(get, default, alls, finalizes, wanted):\n"
+        + indent(handle, "    ")
+        + "    return handle\n"
+    )
 
-    # recursively compile everything
-    rules = copy(rules)
-    for predicate, subrule in rules.items():
-        if type(subrule) is dict:
-            rules[predicate] = compile(subrule)
 
-    get = rules.get
-    if "*" in rules:
-        default = rules["*"]
+class _FanNested:
+    """the handle of the nested tables of several tables for a predicate,
+    taking and returning the accus of all tables"""
+
+    def __init__(self, fans, handle):
+        self.fans = fans
+        self.handle = handle
+
+    def __call__(self, accus, subject, predicate, objects, **opts):
+        fans = self.fans
+        walked = self.handle(
+            [accus[n] for n in fans], subject, predicate, objects, **opts
+        )
+        for n, accu in zip(fans, walked):
+            accus[n] = accu
+        return accus
+
+
+def _compile_fan(tables):
+    """compiles tables into one handle walking them in one traversal, with a
+    list of their accus as accu; the nested tables of several of them for the
+    same predicate are compiled likewise"""
+    handles = [compile(rules) for rules in tables]
+    keys = dict.fromkeys(
+        k for t in tables for k in t if k not in _specials and k != "*"
+    )
+
+    def pairs(rules):
+        return tuple((n, r) for n, r in enumerate(rules) if r is not ignore_silently)
+
+    fanned = {}
+    for k in keys:
+        rules = [h.rules.get(k, h.default) for h in handles]
+        fans = [n for n, t in enumerate(tables) if _fans(t.get(k))]
+        nested = None
+        if len(fans) > 1:
+            nested = _FanNested(fans, _compile_fan([tables[n][k] for n in fans]))
+            for n in fans:
+                rules[n] = ignore_silently
+        fanned[k] = pairs(rules) + ((None, nested),) * (nested is not None)
+    default = pairs(h.default for h in handles)
+    kinds = {_inline_kind(r) for ps in (default, *fanned.values()) for _, r in ps}
+    variant, source = _fan_source(
+        kinds - {None},
+        not default,
+        any(type(r) is _FanNested for ps in fanned.values() for _, r in ps),
+        any("__all__" in h.rules for h in handles),
+        any("__finalize__" in h.rules for h in handles),
+    )
+    handle = _make_handle_maker(variant, source)(
+        fanned.get,
+        default,
+        pairs(h.rules.get("__all__", ignore_silently) for h in handles),
+        pairs(h.rules.get("__finalize__", ignore_silently) for h in handles),
+        frozenset(k for k, ps in fanned.items() if ps).__contains__,
+    )
+    return handle
+
+
+class Profile:
+    """counts calls and measures the cumulative and own time of the rules of a
+    walk by their path, and records which predicates fell through to the
+    default rule of each table and the shapes of the subjects walked by each
+    table, see walk(rules, profile=True)"""
+
+    def __init__(self):
+        self.stats = {}  # path -> [calls, cumulative time, own time]
+        self.fallthrough = {}  # path -> {predicate: count}
+        self.shapes = {}  # path -> {tuple of predicates: count}
+        self._children = []  # time spent in profiled rules called by a rule
+
+    def wrap(self, path, rule):
+        stat = self.stats.setdefault(path, [0, 0.0, 0.0])
+        children = self._children
+
+        def profiled(*args, **opts):
+            children.append(0.0)
+            t0 = perf_counter()
+            try:
+                return rule(*args, **opts)
+            finally:
+                t = perf_counter() - t0
+                own = t - children.pop()
+                if children:
+                    children[-1] += t
+                stat[0] += 1
+                stat[1] += t
+                stat[2] += own
+
+        profiled.__dict__.update(rule.__dict__)  # keeps tables for stack_walker
+        profiled.__wrapped__ = rule
+        return profiled
+
+    def count_fallthrough(self, path, default):
+        counts = self.fallthrough.setdefault(path, {})
+
+        def fallthrough(a, s, p=None, os=None, **opts):
+            counts[p] = counts.get(p, 0) + 1
+            return default(a, s, p, os, **opts)
+
+        fallthrough.__dict__.update(default.__dict__)
+        return fallthrough
+
+    def count_shapes(self, path, handle):
+        counts = self.shapes.setdefault(path, {})
+
+        def shapes(a, s, p, os, **opts):
+            for o in os:
+                if type(o) is dict:
+                    shape = tuple(o)
+                    counts[shape] = counts.get(shape, 0) + 1
+            return handle(a, s, p, os, **opts)
+
+        shapes.__dict__.update(handle.__dict__)
+        return shapes
+
+    def hot_shapes(self, min_share=0.5):
+        """the most common shape of the subjects of each table, when at least
+        min_share of them have it, for compile(rules, shapes=...)"""
+        hot = {}
+        for path, counts in self.shapes.items():
+            if counts:
+                shape, n = max(counts.items(), key=lambda item: item[1])
+                if shape and n >= min_share * sum(counts.values()):
+                    hot[path] = shape
+        return hot
+
+    def report(self, limit=None):
+        """the stats sorted by own time, followed by the fall throughs"""
+        lines = [f"{'calls':>10} {'cumtime':>10} {'owntime':>10}  path"]
+        for path, (calls, cumtime, owntime) in sorted(
+            self.stats.items(), key=lambda item: item[1][2], reverse=True
+        )[:limit]:
+            lines.append(
+                f"{calls:>10} {cumtime:>10.3f} {owntime:>10.3f}  {' > '.join(map(str, path))}"
+            )
+        for path, counts in self.fallthrough.items():
+            if counts:
+                lines.append(
+                    f"\nfell through to default in: {' > '.join(map(str, path))}"
+                )
+                for p, n in sorted(
+                    counts.items(), key=lambda item: item[1], reverse=True
+                ):
+                    lines.append(f"{n:>10}  {p}")
+        return "\n".join(lines)
+
+
+compile_cache_size = 256
+_compile_cache = OrderedDict()  # fingerprint -> handle, least recently used first
+_compiled_in_use = WeakValueDictionary()  # also after eviction, while in use
+
+
+def fingerprint(rules):
+    """rules as a hashable value: equal for tables with the same keys, in the
+    same order, with the same rule objects, nested tables included"""
+    return tuple(
+        (k, fingerprint(v) if type(v) is dict else v) for k, v in rules.items()
+    )
+
+
+def compile(rules, profile=None, path=(), shapes=None):
+    """compiles rules into a handle; tables equal by fingerprint() share one
+    handle, also when they are nested in other tables. A table may be named
+    with "__name__": name and used anywhere in rules with ref(name). With
+    shapes, the tables get a fast path for subjects of the shape given for
+    their path, see Profile.hot_shapes()."""
+    return _compile_shared(rules, profile, path, True, shapes)
+
+
+def _refers(rules):
+    """whether rules contain a ref(), which only _link() can resolve"""
+    for rule in rules.values():
+        if type(rule) is NestInto:
+            rule = rule.rules
+        if type(rule) is Ref or type(rule) is dict and _refers(rule):
+            return True
+    return False
+
+
+def _compile_shared(rules, profile, path, link, shapes=None, linked=None):
+    if link:
+        linked = {}  # fingerprint -> handle, per compile()
+    try:
+        key = fingerprint(rules)
+        hash(key)
+    except TypeError:
+        key = None
+    # _link() wants one handle per name, so within one compile() equal named
+    # tables and tables with refs get one handle, also with a profile
+    refers = not link and _refers(rules)
+    named = (
+        not link
+        and linked is not None
+        and key is not None
+        and ("__name__" in rules or refers)
+    )
+    if named and key in linked:
+        return linked[key]
+    # profiles and shapes are per path, so can not be shared, and what the
+    # refs are depends on the rest
+    if key is None or profile is not None or shapes or refers:
+        handle = _compile(rules, profile, path, link, shapes, linked)
     else:
-        keys = set(rules.keys()) if rules else {}
+        handle = _compile_cache.get(key) or _compiled_in_use.get(key)
+        if handle is None:
+            handle = _compiled_in_use[key] = _compile(
+                rules, profile, path, link, linked=linked
+            )
+        _compile_cache[key] = handle
+        _compile_cache.move_to_end(key)
+        while len(_compile_cache) > compile_cache_size:
+            _compile_cache.popitem(last=False)
+    if named:
+        linked[key] = handle
+    return handle
 
-        def default(a, s, p=None, os=None, **opts):
-            e = LookupError(f"No rule for '{p}' in {keys}")
-            e.subject = (
-                s if s is not None else os[0]
-            )  # called by __switch__ without subject
-            raise e
 
-    all_rule = get("__all__")
+def _compile(rules, profile, path, link, shapes=None, linked=None):
 
-    if "__key__" in rules:
-        key_fn = rules["__key__"]
+    # recursively compile everything, interning keys like intern_record()
+    rules = {intern(k) if type(k) is str else k: v for k, v in rules.items()}
+    for predicate, subrule in rules.items():
+        if predicate == "__name__" or predicate == "__memo__":
+            continue
+        if type(subrule) is dict:
+            rules[predicate] = _compile_shared(
+                subrule, profile, path + (predicate,), False, shapes, linked
+            )
+            continue
+        if type(subrule) is Ref:  # replaced by _link(), or called when it is *
+            rules[predicate] = Ref(subrule.p)
+            continue
+        if type(subrule) is NestInto:
+            subrule = rules[predicate] = subrule.compiled(
+                profile, path + (predicate,), shapes, linked
+            )
+        if profile is not None:
+            rules[predicate] = profile.wrap(path + (predicate,), subrule)
+
+    default = rules["*"] if "*" in rules else _no_rule(rules)
+    if profile is not None:
+        default = profile.count_fallthrough(path, default)
+
+    shape = shapes and shapes.get(path)
+    if shape and "__key__" not in rules and "__switch__" not in rules:
+        shape_rules = tuple(rules.get(k, default) for k in shape)
+        shape_kinds = tuple(_inline_kind(r) or "call" for r in shape_rules)
+    else:
+        shape, shape_rules, shape_kinds = None, None, ()
+
+    switch_fn = _switch_fn(rules)
+
+    # the handle is generated for the specific combination of __all__, __key__,
+    # __switch__ and * in rules, so it does not test for them on every call
+    handle = _handle_maker(rules, shape_kinds)(
+        rules.get,
+        default,
+        rules.get("__all__"),
+        rules.get("__key__"),
+        switch_fn,
+        rules.get("__finalize__"),
+        frozenset(k for k in rules if k not in _specials and k != "*").__contains__,
+        shape,
+        shape_rules,
+    )
+    # for engines that run the tables themselves, see stack_walker()
+    handle.rules = rules
+    handle.default = default
+    handle.switch_fn = switch_fn
+    if "__memo__" in rules:
+        handle = rules["__memo__"].wrap(handle)
+    if profile is not None:
+        handle = profile.wrap(path, profile.count_shapes(path, handle))
+    if link:
+        _link(handle)
+    return handle
 
-        def handle(accu, subject, predicate, objects, **opts):
-            if all_rule is not None:
-                accu = all_rule(accu, subject, predicate, objects, **opts)
-            for subject in objects:
-                for predicate in subject:
-                    objects = subject[predicate]
-                    __key__ = key_fn(accu, subject, predicate, objects)
-                    accu = get(__key__, default)(
-                        accu, subject, predicate, objects, **opts
-                    )
-            return accu
 
-    elif "__switch__" in rules:
-        switch_fn = rules["__switch__"]
+def _no_rule(rules):
+    """the default of a table without "*": raises for any predicate"""
+    keys = set(rules.keys()) if rules else {}
+
+    def default(a, s, p=None, os=None, **opts):
+        e = LookupError(f"No rule for '{p}' in {keys}")
+        e.subject = (
+            s if s is not None else os[0]
+        )  # called by __switch__ without subject
+        raise e
+
+    return default
+
+
+def _link(handle):
+    """replaces the refs in the compiled tables of handle with the handles of
+    the tables they name, so they call each other directly"""
+    names = {}
+    tables = {}  # as dict for the order
+    todo = [handle]
+    while todo:
+        h = todo.pop()
+        if h in tables:
+            continue
+        tables[h] = None
+        name = h.rules.get("__name__")
+        if name is not None:
+            if names.setdefault(name, h) is not h:
+                raise ValueError(f"Two rule tables named '{name}'")
+        for rule in h.rules.values():
+            if hasattr(rule, "default"):
+                todo.append(rule)
+            rule = getattr(rule, "__wrapped__", rule)  # profiled
+            if type(rule) is NestInto and rule.handle is not None:
+                todo.append(rule.handle)
+
+    def named(ref):
+        if ref.p not in names:
+            raise LookupError(f"No rule table named '{ref.p}' for {ref}")
+        return names[ref.p]
+
+    for h in tables:
+        for predicate, rule in h.rules.items():
+            rule = getattr(rule, "__wrapped__", rule)
+            if type(rule) is Ref:
+                h.rules[predicate] = rule.handle = named(rule)
+            elif type(rule) is NestInto and type(rule.rules) is Ref:
+                rule.handle = named(rule.rules)
+
+
+_nokey = object()
+
+
+def stack_locals(stack):
+    """the frames of walk_stack() as if they were locals of a handle"""
+    return [
+        {"__key__": key, "subject": subject}
+        for _, _, _, subject, key in stack
+        if key is not _nokey
+    ]
 
-        def handle(accu, subject, predicate, objects, **opts):
+
+def stack_walker(handle):
+    """runs compiled rules with an explicit stack instead of letting nested
+    handles call each other, so deep documents do not use a Python frame per
+    level. Rules that are not compiled tables are just called, as are
+    wrapped tables, like memoised ones, which then walk recursively."""
+    if hasattr(handle, "__wrapped__"):
+        return handle
+    tables = {}
+    todo = [handle]
+    while todo:
+        h = todo.pop()
+        if h not in tables:
+            tables[h] = (
+                h.rules.get,
+                h.default,
+                h.rules.get("__all__"),
+                h.rules.get("__key__"),
+                h.switch_fn,
+                h.rules.get("__finalize__"),
+            )
+            todo.extend(
+                r
+                for r in (h.default, *h.rules.values())
+                if hasattr(r, "default") and not hasattr(r, "__wrapped__")
+            )
+    get_table = tables.get
+
+    def walk_stack(accu, subject, predicate, objects, **opts):
+        # frames are [table, subjects, predicates, subject, key]
+        __stack__ = []
+        push = __stack__.append
+        pop = __stack__.pop
+
+        def enter(table, accu, subject, predicate, objects):
+            all_rule = table[2]
             if all_rule is not None:
                 accu = all_rule(accu, subject, predicate, objects, **opts)
-            for subject in objects:
-                __key__ = switch_fn(accu, subject)
-                accu = get(__key__, default)(accu, None, None, (subject,), **opts)
+            push([table, iter(objects), iter(()), None, _nokey])
             return accu
 
-    else:
-        # this is the thinnest bottleneck
-        def handle(accu, subject, predicate, objects, **opts):
-            if (
-                all_rule is not None
-            ):  # TODO move this check to compile time (use exec to dynamically compile handle with/out all_rule)
-                accu = all_rule(accu, subject, predicate, objects, **opts)
-            for subject in objects:
-                for __key__ in subject:
-                    accu = get(__key__, default)(
-                        accu, subject, __key__, subject[__key__], **opts
+        accu = enter(tables[handle], accu, subject, predicate, objects)
+        while __stack__:
+            frame = __stack__[-1]
+            get, default, _, key_fn, switch_fn, finalize = frame[0]
+            if switch_fn is not None:
+                subject = next(frame[1], _nokey)
+                if subject is _nokey:
+                    pop()
+                    if finalize is not None:
+                        accu = finalize(accu, **opts)
+                    continue
+                frame[3] = subject
+                frame[4] = key = switch_fn(accu, subject)
+                rule = get(key, default)
+                table = get_table(rule)
+                if table is None:
+                    accu = rule(accu, None, None, (subject,), **opts)
+                else:
+                    accu = enter(table, accu, None, None, (subject,))
+                continue
+            # resumes where a nested table interrupted it
+            subject = frame[3]
+            for predicate in frame[2]:
+                objects = subject[predicate]
+                if key_fn is None:
+                    frame[4] = key = predicate
+                else:
+                    frame[4] = key = key_fn(accu, subject, predicate, objects)
+                rule = get(key, default)
+                table = get_table(rule)
+                if table is None:
+                    accu = (
+                        rule(accu, subject, predicate, objects, **opts)
+                        if opts
+                        else rule(accu, subject, predicate, objects)
                     )
-            return accu
-
-    return handle
+                else:
+                    accu = enter(table, accu, subject, predicate, objects)
+                    break
+            else:
+                subject = next(frame[1], _nokey)
+                if subject is _nokey:
+                    pop()
+                    if finalize is not None:
+                        accu = finalize(accu, **opts)
+                else:
+                    frame[3] = subject
+                    frame[2] = iter(subject)
+        return accu
+
+    return walk_stack
+
+
+def walker(rules, stack=False, profile=None, shapes=None):
+    """compiles rules into the handle walk_fn and walk_many call per subject"""
+    if type(rules) is FanOut:
+        return rules.walker(stack, profile, shapes)
+    w = compile(rules, profile, shapes=shapes)
+    return stack_walker(w) if stack and profile is None else w
+
+
+def walk_error(e, subject):
+    """describes e with the trace of __key__s leading to it; call from an except"""
+    locals_from_stack = locals_with_key()
+    if locals_from_stack:
+        subject = locals_from_stack[-1].get("subject")
+    return Exception(
+        f"{e.__class__.__name__}: {str(e)} at:{trace(locals_from_stack)} while processing:\n{pformat(subject)}"
+    )
 
 
-def walk(rules, catch=True):
-    w = compile(rules)
+_subject_repr = Repr()
+_subject_repr.maxlevel = 3
+_subject_repr.maxdict = _subject_repr.maxlist = _subject_repr.maxtuple = 10
+_subject_repr.maxstring = _subject_repr.maxother = 100
+
+
+def error_record(e, record, max_subject=None):
+    """describes e as a dict with its type, message, the __key__ path to it and
+    the @id of record; call from an except. With max_subject, the subject is
+    added, rendered in at most about that many characters"""
+    locals_from_stack = locals_with_key()
+    error = {
+        "type": e.__class__.__name__,
+        "message": str(e),
+        "path": [lokals["__key__"] for lokals in locals_from_stack],
+        "id": record.get("@id") if isinstance(record, dict) else None,
+    }
+    if max_subject:
+        subject = locals_from_stack[-1].get("subject") if locals_from_stack else record
+        error["subject"] = _subject_repr.repr(subject)[:max_subject]
+    return error
+
+
+def walk(rules, catch=True, stack=False, profile=False, index=None, shapes=None):
+    """returns a function walking a subject with rules; with stack=True nested
+    rule tables are walked with an explicit stack, see stack_walker(). With
+    profile=True (or a Profile) the rules are profiled in walk_fn.profile;
+    profiled tables are always walked recursively, also with stack=True.
+    A rule table may have "__finalize__": fn(accu, **opts), which is called
+    with the accu after the table has been walked, e.g. freeze. With index (a
+    NodeIndex) references to other nodes are walked as if they were embedded,
+    see NodeIndex.resolve(). With shapes, e.g. the hot_shapes() of a profile of
+    a sample, tables get a straight-line fast path for the common subject.
+    With fan_out(name=rules, ...) the tables are walked in one traversal, into
+    (and returning) a dict of accus by name."""
+    if profile is True:
+        profile = Profile()
+    w = walker(rules, stack=stack, profile=profile or None, shapes=shapes)
 
     def walk_fn(subject, accu=None, **opts):
-        accu = {} if accu is None else accu
+        if accu is None:
+            accu = {n: {} for n in rules} if type(rules) is FanOut else {}
         try:
+            if index is not None:
+                subject = index.resolve(subject)
             return w(accu, None, None, (subject,), **opts)
         except Exception as e:
             if catch:
-                locals_from_stack = locals_with_key()
-                subject = locals_from_stack[-1].get("subject")
-                raise Exception(
-                    f"{e.__class__.__name__}: {str(e)} at:{trace(locals_from_stack)} while processing:\n{pformat(subject)}"
-                ) from e
+                raise walk_error(e, subject) from e
             raise e
 
+    walk_fn.profile = profile or None
     return walk_fn
 
 
+def walk_many(
+    rules,
+    records,
+    accu_factory=dict,
+    catch=True,
+    stack=False,
+    errors=None,
+    max_subject=None,
+    index=None,
+    shapes=None,
+    **opts,
+):
+    """lazily walks each of records into a fresh accu from accu_factory,
+    yielding the results; rules are compiled once and opts passed to all.
+    With errors, a failing record is skipped and its error_record() passed to
+    errors instead of stopping the walk. With index, shapes and fan_out(), see
+    walk(); accu_factory then makes the accu of each table."""
+    w = walker(rules, stack=stack, shapes=shapes)
+    new_accu = accu_factory
+    if type(rules) is FanOut:
+
+        def new_accu():
+            return {n: accu_factory() for n in rules}
+
+    for record in records:
+        try:
+            if index is not None:
+                record = index.resolve(record)
+            result = w(new_accu(), None, None, (record,), **opts)
+        except Exception as e:
+            if errors is not None:
+                errors(error_record(e, record, max_subject=max_subject))
+                continue
+            if catch:
+                raise walk_error(e, record) from e
+            raise e
+        yield result
+
+
 """ Some auxilary rules (not tested here) on top of Walk, that are generic enough to place here. """
 
 
@@ -211,56 +1023,431 @@ def all_values_in(*values):
     return all_values_in_fn
 
 
-def identity(a, _, p, os):
+def identity(a, _, p, os, **__):
     a[p] = os
     return a
 
 
 def map_predicate(p):
-    def map_predicate_fn(a, _, __, os):
-        a[p] = os
-        return a
-
-    return map_predicate_fn
+    return rename(p)
 
 
 def map_predicate2(p, normalize=tuple):
+    """adds the values to those of p; NB rebuilds the tuple of p each time,
+    use collect() when many predicates add to the same p"""
+
     def map_predicate_fn(a, _, __, os):
         old = a.setdefault(p, ())
-        a[p] = old + normalize(os)
+        if type(old) is Collected:  # collect() on the same p
+            old.extend(normalize(os))
+        else:
+            a[p] = old + normalize(os)
         return a
 
     return map_predicate_fn
 
 
-def l2t_fn(a, s, p, os):
-    a[p] = tuple(list2tuple(o) for o in os) if type(os) is list else os
+class Collected(list):
+    """values being collected by collect(), until freeze() makes them a tuple"""
+
+    __slots__ = ("dedup",)
+
+
+def hashable(o):
+    """a hashable value that is equal for equal (nested) dicts and lists;
+    values are tagged with their type, as 1, 1.0 and True are equal"""
+    if isinstance(o, dict):
+        return frozenset((k, hashable(v)) for k, v in o.items())
+    if isinstance(o, (list, tuple)):
+        return tuple(hashable(v) for v in o)
+    return o.__class__, o
+
+
+def freeze(a, **_):
+    """turns the values collected by collect() into tuples"""
+    for p, values in a.items():
+        if type(values) is Collected:
+            if values.dedup:
+                unique = {}
+                for v in values:
+                    unique.setdefault(hashable(v), v)
+                values = unique.values()
+            a[p] = tuple(values)
     return a
 
 
-l2t_walk = walk({"*": l2t_fn})
+class Memo:
+    """an LRU cache for the results of a rule table marked with "__memo__":
+    memoize(), which must be pure: its result only depends on the objects
+    walked and the opts. Only walks into a fresh, empty accu are memoised, as
+    those of nest_into() are. Results are shallow copies of the cached ones,
+    sharing their values, so do not modify those."""
+
+    def __init__(self, size=1024, by="hash"):
+        if by not in ("hash", "@id"):
+            raise ValueError(f"Expected by='hash' or by='@id', got {by!r}")
+        self.size = size
+        self.by = by
+        self.cache = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, objects, opts):
+        """the @ids or the structure of objects, with opts; None if any has
+        no @id"""
+        if self.by == "@id":
+            key = tuple(o.get("@id") for o in objects)
+            if None in key:
+                return None
+        else:
+            key = hashable(objects)
+        return (key, hashable(opts)) if opts else key
+
+    def wrap(self, handle):
+        cache = self.cache
+
+        def memoized(accu, subject, predicate, objects, **opts):
+            if accu:
+                return handle(accu, subject, predicate, objects, **opts)
+            try:
+                key = self.key(objects, opts)
+                result = cache.get(key)
+            except TypeError:  # unhashable, e.g. an opt
+                key = None
+            if key is None:
+                return handle(accu, subject, predicate, objects, **opts)
+            if result is not None:
+                self.hits += 1
+                cache.move_to_end(key)
+                return copy(result)
+            self.misses += 1
+            result = handle(accu, subject, predicate, objects, **opts)
+            cache[key] = copy(result)
+            if len(cache) > self.size:
+                cache.popitem(last=False)
+                self.evictions += 1
+            return result
+
+        memoized.__dict__.update(handle.__dict__)  # keeps tables for _link()
+        memoized.__wrapped__ = handle  # but stack_walker() calls it
+        return memoized
+
+    def __repr__(self):
+        return (
+            f"memoize({self.size}, by={self.by!r}): {self.hits} hits, "
+            f"{self.misses} misses, {self.evictions} evictions"
+        )
 
 
-def list2tuple(d):
-    return l2t_walk(d) if type(d) is dict else d
+def memoize(size=1024, by="hash"):
+    """marks a rule table as pure with "__memo__": memoize(), caching its
+    results for the last size different objects, by their structure or by
+    their @id. Hits, misses and evictions are counted on it."""
+    return Memo(size, by)
+
+
+class FanOut(dict):
+    """named rule tables walked in one traversal, see fan_out()"""
+
+    def walker(self, stack=False, profile=None, shapes=None):
+        """a handle walking all tables, with a dict of their accus by name as
+        accu. The tables that can be are compiled into one by _compile_fan(),
+        the others are walked separately, as are all with stack or profile."""
+        fanned = []
+        if not stack and profile is None:
+            fanned = [n for n, t in self.items() if _fans(t) and not _refers(t)]
+        if len(fanned) < 2:
+            fanned = []
+        separate = [
+            (n, walker(t, stack, profile, shapes))
+            for n, t in self.items()
+            if n not in fanned
+        ]
+        fan = _compile_fan([self[n] for n in fanned]) if fanned else None
+
+        def walk_fan_out(accu, subject, predicate, objects, **opts):
+            accu = dict(accu)
+            if fan is not None:
+                accus = [accu[n] for n in fanned]
+                accus = fan(accus, subject, predicate, objects, **opts)
+                accu.update(zip(fanned, accus))
+            for n, w in separate:
+                accu[n] = w(accu[n], subject, predicate, objects, **opts)
+            return accu
 
+        return walk_fan_out
 
-def t2l_fn(a, s, p, os):
-    a[p] = list(tuple2list(o) for o in os) if isinstance(os, (tuple, list)) else os
-    return a
+
+def fan_out(**tables):
+    """walks the rule tables given by name in one traversal of a record,
+    each into its own accu, e.g. walk(fan_out(index=..., display=...)) gives
+    {"index": {...}, "display": {...}}. Where the tables have nested tables
+    for the same predicate, those are merged as well. Tables with "__key__",
+    "__switch__", "__memo__", "__name__" or ref()s do their own traversal."""
+    return FanOut(tables)
+
+
+def _fans(rules):
+    """whether rules can be compiled with other tables by _compile_fan()"""
+    return type(rules) is dict and not rules.keys() & {
+        "__key__",
+        "__switch__",
+        "__memo__",
+        "__name__",
+    }
 
 
-t2l_walk = walk({"*": t2l_fn})
+""" Declarative rules: compile() recognises these and inlines what they do
+into the generated handle instead of calling them, see _apply_source(). They
+update the accu in place. Called directly they work like the rule functions. """
+
+
+class Rule:
+    kind = None
+
+    def __init__(self, p, *args):
+        self.p = p
+        self.args = (p, *args)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.args == other.args
+
+    def __hash__(self):
+        return hash((type(self), self.p))
+
+    def __repr__(self):
+        return f"{self.kind}({', '.join(map(repr, self.args))})"
+
+
+class Rename(Rule):
+    kind = "rename"
+
+    def __call__(self, a, s, p, os, **opts):
+        a[self.p] = os
+        return a
+
+
+class FirstValue(Rule):
+    kind = "first_value"
+
+    def __call__(self, a, s, p, os, **opts):
+        a[self.p] = os[0]["@value"]
+        return a
+
+
+class Collect(Rule):
+    kind = "collect"
+
+    def __init__(self, p, normalize=None, dedup=False):
+        super().__init__(p, normalize, dedup)
+        self.normalize = normalize
+        self.dedup = dedup
+
+    def __call__(self, a, s, p, os, **opts):
+        values = a.get(self.p)
+        if type(values) is not Collected:
+            values = a[self.p] = Collected(() if values is None else values)
+            values.dedup = self.dedup
+        values.extend(os if self.normalize is None else self.normalize(os))
+        return a
+
+
+class NestInto(Rule):
+    kind = "nest_into"
+
+    def __init__(self, p, rules, handle=None):
+        super().__init__(p, rules)
+        self.rules = rules
+        self.handle = handle
+
+    def compiled(self, profile=None, path=(), shapes=None, linked=None):
+        """a copy with the compiled rules, or to be linked by _link() for a ref"""
+        if type(self.rules) is Ref:
+            return NestInto(self.p, self.rules)
+        return NestInto(
+            self.p,
+            self.rules,
+            _compile_shared(self.rules, profile, path, False, shapes, linked),
+        )
+
+    def __call__(self, a, s, p, os, **opts):
+        if self.handle is None:
+            self.handle = compile(self.rules)
+        handle = self.handle
+        a[p if self.p is None else self.p] = [
+            handle({}, None, None, (o,), **opts) for o in os
+        ]
+        return a
 
 
-def tuple2list(d):
-    return t2l_walk(d) if isinstance(d, dict) else d
+class Ref(Rule):
+    kind = "ref"
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.handle = None
+
+    def __call__(self, a, s, p, os, **opts):
+        return self.handle(a, s, p, os, **opts)
+
+
+def ref(name):
+    """the rule table named name with "__name__": name, anywhere in the rules
+    being compiled, including the table itself for recursion. Use it as a rule
+    or with nest_into(p, ref(name))."""
+    return Ref(name)
+
+
+def rename(p):
+    """puts the objects under p"""
+    return Rename(p)
+
+
+def first_value(p):
+    """puts the @value of the first object under p"""
+    return FirstValue(p)
+
+
+def collect(p, normalize=None, dedup=False):
+    """like map_predicate2, but appends the values to a list, turned into a
+    tuple by freeze() afterwards, so it takes linear instead of quadratic time.
+    Use freeze as "__finalize__" in the rules. With dedup, freeze() removes
+    duplicate values, keeping the first."""
+    return Collect(p, normalize, dedup)
+
+
+def nest_into(p, rules):
+    """walks each object with rules into a new accu and puts the list of them
+    under p (or the predicate itself when p is None)"""
+    return NestInto(p, rules)
+
+
+def list2tuple(d, in_place=False):
+    """turns the lists in the values of d into tuples, recursing into the dicts
+    in them. Tuples are already frozen and are not looked into. Without
+    in_place, d and the nested dicts are copied."""
+    if type(d) is not dict:
+        return d
+    root = d if in_place else {}
+    todo = [(d, root)]
+    push = todo.append
+    pop = todo.pop
+    while todo:
+        src, dst = pop()
+        for p, os in src.items():
+            if type(os) is list:
+                frozen = []
+                for o in os:
+                    if type(o) is dict:
+                        for v in o.values():
+                            if type(v) is list:
+                                n = o if in_place else {}
+                                push((o, n))
+                                o = n
+                                break
+                        else:  # leaves, like value objects, need no walking
+                            o = o if in_place else o.copy()
+                    frozen.append(o)
+                dst[p] = tuple(frozen)
+            elif not in_place:
+                dst[p] = os
+    return root
+
+
+def tuple2list(d, in_place=False):
+    """turns the tuples (and lists) in the values of d into new lists,
+    recursing into the dicts in them. Without in_place, d and the nested dicts
+    are copied into plain dicts."""
+    if not isinstance(d, dict):
+        return d
+    root = d if in_place else {}
+    todo = [(d, root)]
+    push = todo.append
+    pop = todo.pop
+    while todo:
+        src, dst = pop()
+        for p, os in src.items():
+            if isinstance(os, (tuple, list)):
+                thawed = []
+                for o in os:
+                    if isinstance(o, dict):
+                        for v in o.values():
+                            if isinstance(v, (tuple, list)):
+                                n = o if in_place else {}
+                                push((o, n))
+                                o = n
+                                break
+                        else:  # leaves, like value objects, need no walking
+                            o = o if in_place else dict(o)
+                    thawed.append(o)
+                dst[p] = thawed
+            elif not in_place:
+                dst[p] = os
+    return root
+
+
+_intern_values = frozenset(("@type", "@language"))
+
+
+def intern_record(d):
+    """returns a copy of d with all keys, and the strings in @type and
+    @language, interned, so equal IRIs in all records share one string. This
+    saves memory when many records are kept; it does not make walking them
+    measurably faster."""
+    if type(d) is not dict:
+        return d
+    root = {}
+    todo = [(d, root)]
+    push = todo.append
+    pop = todo.pop
+    while todo:
+        src, dst = pop()
+        for k, v in src.items():
+            if type(k) is str:
+                k = intern(k)
+            intern_strings = k in _intern_values
+            if type(v) is list:
+                values = []
+                for o in v:
+                    if type(o) is dict:
+                        n = {}
+                        push((o, n))
+                        o = n
+                    elif intern_strings and type(o) is str:
+                        o = intern(o)
+                    values.append(o)
+                v = values
+            elif intern_strings and type(v) is str:
+                v = intern(v)
+            dst[k] = v
+    return root
+
+
+def _interned_pairs(pairs):
+    d = {}
+    for k, v in pairs:
+        k = intern(k)
+        if k in _intern_values:
+            if type(v) is str:
+                v = intern(v)
+            elif type(v) is list:
+                v = [intern(o) if type(o) is str else o for o in v]
+        d[k] = v
+    return d
+
+
+_decode_interned = json.JSONDecoder(object_pairs_hook=_interned_pairs).decode
+
+
+def loads_interned(s):
+    """json.loads, interning like intern_record() while parsing; NB slower
+    than json.loads, up to about twice, so only worth it to save memory"""
+    return _decode_interned(s.decode() if isinstance(s, bytes) else s)
 
 
 ### old stuff with index
 def node_index(j):
     # from jsonld2document from metastreams.index
-    """index all (top level) nodes by their @id"""
+    """index all (top level) nodes by their @id; see NodeIndex for nested nodes"""
     if "@graph" in j:
         j = j["@graph"]
     return {m["@id"]: m for m in j if "@id" in m}
@@ -268,14 +1455,28 @@ def node_index(j):
 
 __all__ = [
     "walk",
+    "walk_many",
+    "fingerprint",
+    "error_record",
+    "Profile",
     "ignore_assert",
     "ignore_silently",
     "unsupported",
     "map_predicate2",
     "map_predicate",
+    "collect",
+    "freeze",
+    "memoize",
+    "fan_out",
+    "rename",
+    "first_value",
+    "nest_into",
+    "ref",
     "identity",
     "all_values_in",
     "list2tuple",
     "node_index",
     "tuple2list",
+    "intern_record",
+    "loads_interned",
 ]
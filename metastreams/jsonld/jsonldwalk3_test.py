@@ -24,6 +24,8 @@
 
 from .jsonldwalk3 import (
     walk,
+    walk_many,
+    Profile,
     ignore_silently,
     ignore_assert,
     identity,
@@ -31,8 +33,24 @@ from .jsonldwalk3 import (
     node_index,
     tuple2list,
     map_predicate2,
+    collect,
+    freeze,
+    rename,
+    first_value,
+    nest_into,
+    map_predicate,
+    intern_record,
+    loads_interned,
+    compile,
+    fingerprint,
+    ref,
+    memoize,
+    fan_out,
+    _compile_fan,
 )
 import pytest
+import sys
+import gc
 
 
 def test_simple_basics():
@@ -177,6 +195,50 @@ def test_pass_kwargs():
     }
 
 
+def test_generated_handle_variants():
+    r = []
+    all_rule = lambda a, s, p, os, **opts: r.append(("all", opts)) or a
+    default = lambda a, s, p, os, **opts: r.append((p, opts)) or a
+    for rules in (
+        {"*": default},
+        {"*": default, "__all__": all_rule},
+        {"a": default, "*": default},
+        {"a": default, "*": default, "__all__": all_rule},
+    ):
+        w = walk(rules)
+        w({"a": 1, "b": 2})
+        w({"a": 1}, x=42)
+        if "__all__" in rules:
+            assert r.pop(0) == ("all", {})
+        assert r.pop(0) == ("a", {})
+        assert r.pop(0) == ("b", {})
+        if "__all__" in rules:
+            assert r.pop(0) == ("all", {"x": 42})
+        assert r.pop(0) == ("a", {"x": 42})
+        assert r == []
+
+
+def test_sparse_dispatch():
+    r = []
+    rule = lambda a, s, p, os, **opts: r.append((p, opts)) or a
+    rules = {"c": rule, "a": rule, "*": ignore_silently, "__all__": rule}
+    w = walk(rules)
+    w({"a": 1, "b": 2, "c": 3, "d": 4})
+    w({"b": 2, "c": 3}, x=42)
+    assert r == [(None, {}), ("a", {}), ("c", {}), (None, {"x": 42}), ("c", {"x": 42})]
+    handle = compile(rules)
+    assert handle.__code__.co_filename == "<jsonldwalk3 handle sparse+all>"
+    assert walk({"*": ignore_silently})({"a": 1}) == {}
+
+
+def test_generated_handle_in_traceback():
+    w = walk({"a": lambda a, s, p, os: 1 / 0}, catch=False)
+    with pytest.raises(ZeroDivisionError) as e:
+        w({"a": 42})
+    assert "<jsonldwalk3 handle dispatch>" in str(e.traceback)
+    assert "accu = get(__key__, default)(" in str(e.getrepr())
+
+
 def test_append_to_list():
     def append(a, s, p, os):
         a.setdefault(p, []).extend(os)
@@ -274,6 +336,41 @@ def test_switch_toplevel():
     assert r2.pop() == ({}, None, None, ({"@type": ["strings"], "a": ["42"]},))
 
 
+def test_type_switch():
+    rules = {
+        "__switch__": "@type",
+        "Book": {"@type": identity, "title": rename("book")},
+        "Work": {"@type": identity, "title": rename("work")},
+        "*": {"@type": identity, "title": rename("other")},
+    }
+    nested = walk({"z": rules})
+    for w in (walk(rules), walk(rules, stack=True), lambda s: nested({"z": [s]})):
+        subject = lambda *types: {"@type": list(types), "title": [1]}
+        assert w(subject("Work")) == {"@type": ["Work"], "work": [1]}
+        # the first in rules wins
+        assert w(subject("Work", "Book"))["book"] == [1]
+        assert w(subject("Thing", "Work"))["work"] == [1]
+        assert w(subject("Thing")) == {"@type": ["Thing"], "other": [1]}
+        assert w({"@type": "Book", "title": [1]})["book"] == [1]  # compacted
+        assert w({"title": [1]}) == {"other": [1]}
+
+    handle = compile(rules)
+    assert handle.__code__.co_filename == "<jsonldwalk3 handle typeswitch>"
+    assert handle.switch_fn.cache == {  # shared by the walks above
+        ("Work",): "Work",
+        ("Work", "Book"): "Book",
+        ("Thing", "Work"): "Work",
+        ("Thing",): "Thing",
+        (): None,
+    }
+
+    with pytest.raises(Exception) as e:
+        walk({"__switch__": "@type", "Book": identity})({"@type": ["Work"]})
+    assert str(e.value).startswith("LookupError: No rule for 'None' in ")
+    with pytest.raises(ValueError):
+        walk({"__switch__": "@id"})
+
+
 def test_switch_with_dict():
     w = walk(
         {
@@ -670,6 +767,69 @@ def test_tuple2list_subclass():
         pass
 
     assert tuple2list(D(a=(D(b=()),))) == {"a": [{"b": []}]}
+    assert type(tuple2list(D(a=(D(b=()),)))["a"][0]) is dict
+    assert type(tuple2list(D(a=(D(b=1),)))["a"][0]) is dict
+    assert list2tuple(D(a=[1])) == {"a": [1]}  # only exact dicts
+
+
+def test_list2tuple_tuple2list_same_as_walk():
+    def l2t(d):
+        return (
+            walk(
+                {
+                    "*": lambda a, s, p, os: a
+                    | {p: tuple(l2t(o) for o in os) if type(os) is list else os}
+                }
+            )(d)
+            if type(d) is dict
+            else d
+        )
+
+    def t2l(d):
+        return (
+            walk(
+                {
+                    "*": lambda a, s, p, os: a
+                    | {
+                        p: (
+                            list(t2l(o) for o in os)
+                            if isinstance(os, (tuple, list))
+                            else os
+                        )
+                    }
+                }
+            )(d)
+            if isinstance(d, dict)
+            else d
+        )
+
+    d = {
+        "a": [{"b": [1, [2]], "c": {"d": [3]}}, {"@value": 4}, 5],
+        "e": ({"f": [6]},),
+        "g": {"h": [7]},
+        "i": "j",
+    }
+    assert list2tuple(d) == l2t(d)
+    assert list2tuple(d)["a"][2] == 5
+    assert list2tuple(d)["e"][0]["f"] == [6]  # frozen, not looked into
+    assert list2tuple(d)["g"] is d["g"]
+    assert tuple2list(d) == t2l(d)
+    assert tuple2list(list2tuple(d)) == t2l(l2t(d))
+    assert tuple2list(d)["a"][1] is not d["a"][1]
+
+
+def test_list2tuple_tuple2list_in_place():
+    v = {"@value": 1}
+    n = {"b": [v]}
+    d = {"a": [n, 2], "c": 3}
+    r = list2tuple(d, in_place=True)
+    assert r is d
+    assert d == {"a": ({"b": ({"@value": 1},)}, 2), "c": 3}
+    assert d["a"][0] is n and d["a"][0]["b"][0] is v
+    r = tuple2list(d, in_place=True)
+    assert r is d
+    assert d == {"a": [{"b": [{"@value": 1}]}, 2], "c": 3}
+    assert d["a"][0] is n and d["a"][0]["b"][0] is v
 
 
 def test_map_predicate2_normalize():
@@ -713,3 +873,733 @@ def test_key_to_change_something():
         "A": ({"@value": "aap"}, {"@value": "noot"}),
         "B": ({"@value": "mies"},),
     }
+
+
+def test_stack_engine_same_results():
+    for rules, subject in (
+        ({"a": {"b": identity}}, {"a": [{"b": 41}]}),
+        (
+            {"__all__": lambda a, s, p, os: a | {"all": p}, "*": {"*": identity}},
+            {"a": [{"b": 1}, {"c": 2}], "d": [{"e": 3}]},
+        ),
+        (
+            {
+                "__key__": lambda a, s, p, os: p.upper(),
+                "A": {"__switch__": lambda a, s: s["t"], "x": {"*": identity}},
+            },
+            {"a": [{"t": "x", "b": 1}]},
+        ),
+    ):
+        assert walk(rules, stack=True)(subject) == walk(rules)(subject)
+        assert walk(rules, stack=True)(subject, accu={"z": 1}) == walk(rules)(
+            subject, accu={"z": 1}
+        )
+
+
+def test_stack_engine_deep_nesting():
+    nested = {"@value": identity}
+    deep = {"@value": 0}
+    for _ in range(200):
+        nested = {"part": nested}
+        deep = {"part": [deep]}
+    recursive = walk(nested)
+    stacked = walk(nested, stack=True)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(150)
+    try:
+        assert stacked(deep) == {"@value": 0}
+        with pytest.raises(RecursionError):
+            recursive(deep)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def test_stack_engine_errors():
+    w = walk(
+        {
+            "a": {"b": identity},
+            "b": {
+                "c": identity,
+                "d": {},
+            },
+        },
+        stack=True,
+    )
+    with pytest.raises(Exception) as e:
+        w({"b": [{"d": [{"e": 42}]}]})
+    assert (
+        str(e.value)
+        == "LookupError: No rule for 'e' in {} at:\n> b\n-> d\n--> e while processing:\n{'e': 42}"
+    )
+    w = walk({"a": {"b": {"c": identity}}}, stack=True)
+    with pytest.raises(Exception) as e:
+        w({"a": [{"b": 42}]})
+    assert (
+        str(e.value)
+        == "TypeError: 'int' object is not iterable at:\n> a\n-> b while processing:\n{'b': 42}"
+    )
+
+
+def accept_opts(a, s, p, os, **opts):
+    return a | {p: (os, opts)}
+
+
+def test_walk_many():
+    records = iter([{"a": [1]}, {"a": [2], "b": [3]}])
+    results = walk_many({"*": accept_opts}, records, x=42)
+    assert next(results) == {"a": ([1], {"x": 42})}
+    assert next(records) == {"a": [2], "b": [3]}  # lazy
+    assert list(results) == []
+
+    results = walk_many({"*": identity}, [{"a": [1]}, {"a": [2]}], accu_factory=list)
+    with pytest.raises(Exception) as e:
+        next(results)
+    assert str(e.value).startswith(
+        "TypeError: list indices must be integers or slices, not str at:\n> a while processing:"
+    )
+
+
+def test_walk_many_errors():
+    results = walk_many({"a": {"b": identity}}, [{"a": [{"b": 1}]}, {"a": [{"c": 2}]}])
+    assert next(results) == {"b": 1}
+    with pytest.raises(Exception) as e:
+        next(results)
+    assert (
+        str(e.value)
+        == "LookupError: No rule for 'c' in {'b'} at:\n> a\n-> c while processing:\n{'c': 2}"
+    )
+    with pytest.raises(Exception) as e:
+        list(walk_many({"a": identity}, [42]))
+    assert (
+        str(e.value)
+        == "TypeError: 'int' object is not iterable at: while processing:\n42"
+    )
+    with pytest.raises(LookupError):
+        list(walk_many({"a": identity}, [{"b": 1}], catch=False))
+
+
+def test_walk_many_collects_errors():
+    errors = []
+    records = [
+        {"@id": "id:1", "a": [{"b": 1}]},
+        {"@id": "id:2", "a": [{"c": "x" * 1000}]},
+        42,
+        {"@id": "id:4", "a": [{"b": 4}]},
+    ]
+    results = walk_many(
+        {"@id": ignore_silently, "a": {"b": identity}}, records, errors=errors.append
+    )
+    assert list(results) == [{"b": 1}, {"b": 4}]
+    assert errors == [
+        {
+            "type": "LookupError",
+            "message": "No rule for 'c' in {'b'}",
+            "path": ["a", "c"],
+            "id": "id:2",
+        },
+        {
+            "type": "TypeError",
+            "message": "'int' object is not iterable",
+            "path": [],
+            "id": None,
+        },
+    ]
+
+    errors.clear()
+    list(
+        walk_many(
+            {"@id": ignore_silently, "a": {"b": identity}},
+            records[1:2],
+            errors=errors.append,
+            max_subject=1000,
+        )
+    )
+    assert errors[0]["subject"] == "{'c': '" + 47 * "x" + "..." + 48 * "x" + "'}"
+
+
+def test_profile():
+    w = walk(
+        {
+            "dcterms:creator": {"foaf:name": identity, "*": ignore_silently},
+            "dcterms:title": identity,
+        },
+        profile=True,
+    )
+    for _ in range(3):
+        w(
+            {
+                "dcterms:creator": [{"foaf:name": 1, "foaf:mbox": 2}, {"foaf:age": 3}],
+                "dcterms:title": 4,
+            }
+        )
+    stats = w.profile.stats
+    assert {path: s[0] for path, s in stats.items()} == {
+        (): 3,
+        ("dcterms:creator",): 3,
+        ("dcterms:creator", "foaf:name"): 3,
+        ("dcterms:creator", "*"): 6,
+        ("dcterms:title",): 3,
+    }
+    calls, cumtime, owntime = stats[("dcterms:creator",)]
+    assert cumtime >= owntime
+    assert stats[()][1] >= cumtime + stats[("dcterms:title",)][1]
+    assert w.profile.fallthrough == {
+        ("dcterms:creator",): {"foaf:mbox": 3, "foaf:age": 3},
+        (): {},
+    }
+    report = w.profile.report()
+    assert "dcterms:creator > foaf:name" in report
+    assert (
+        "fell through to default in: dcterms:creator\n         3  foaf:mbox" in report
+    )
+
+    with pytest.raises(Exception):
+        w({"x": 1})
+    assert w.profile.fallthrough[()] == {"x": 1}
+
+
+def test_profile_with_stack_engine():
+    profile = Profile()
+    w = walk({"a": {"b": identity}}, stack=True, profile=profile)
+    assert w({"a": [{"b": 1}]}) == {"b": 1}
+    assert w.profile is profile
+    assert profile.stats[("a", "b")][0] == 1
+    assert profile.stats[("a",)][0] == profile.stats[()][0] == 1
+    assert profile.stats[()][1] > 0
+    assert profile.hot_shapes() == {(): ("a",), ("a",): ("b",)}
+
+
+def test_intern_record():
+    name = "".join(["http://schema.org/", "name"])
+    r1 = intern_record(
+        {
+            name: [{"@value": "aap", "@language": "".join(["n", "l"])}],
+            "@type": ["".join(["http://schema.org/", "Thing"])],
+            "x": {"y": "z"},
+        }
+    )
+    r2 = intern_record(
+        {
+            "".join(["http://schema.org/", "name"]): [
+                {"@value": "noot", "@language": "".join(["n", "l"])}
+            ],
+            "@type": ["".join(["http://schema.org/", "Thing"])],
+        }
+    )
+    (k1, *_), (k2, *_) = r1, r2
+    assert k1 is k2 is sys.intern(name)
+    assert r1[k1][0]["@language"] is r2[k2][0]["@language"]
+    assert r1["@type"][0] is r2["@type"][0]
+    assert r1["x"] == {"y": "z"}
+    assert intern_record(42) == 42
+
+    s = '{"http://schema.org/name": [{"@value": "aap", "@type": "xsd:string"}], "@type": ["T"]}'
+    r3 = loads_interned(s)
+    assert r3 == {
+        "http://schema.org/name": [{"@value": "aap", "@type": "xsd:string"}],
+        "@type": ["T"],
+    }
+    k3, k4 = next(iter(r3)), next(iter(loads_interned(s.encode())))
+    assert k3 is k4 is k1
+    assert r3[k3][0]["@type"] is loads_interned(s)[k3][0]["@type"]
+
+
+def test_compile_interns_rule_keys():
+    name = "".join(["http://schema.org/", "name"])
+    h = compile({name: identity})
+    assert next(iter(h.rules)) is sys.intern(name)
+
+
+def test_finalize():
+    r = []
+    rules = {
+        "a": {
+            "b": identity,
+            "__finalize__": lambda a, **opts: r.append(("a", opts)) or a,
+        },
+        "c": lambda a, s, p, os, **opts: a | {p: os},
+        "__finalize__": lambda a, **opts: r.append(("top", opts)) or a | {"done": True},
+    }
+    for stack in (False, True):
+        w = walk(rules, stack=stack)
+        assert w({"a": [{"b": 1}], "c": 2}) == {"b": 1, "c": 2, "done": True}
+        assert r == [("a", {}), ("top", {})]
+        assert w({"c": 2}, x=1) == {"c": 2, "done": True}
+        assert r[2:] == [("top", {"x": 1})]
+        r.clear()
+
+
+def test_collect():
+    rules = {
+        "__key__": lambda a, s, p, os: p.split(".")[0],
+        "id": collect("identifier"),
+        "other": collect("identifier", dedup=True),
+        "name": collect("name", normalize=lambda os: [o.upper() for o in os]),
+        "__finalize__": freeze,
+    }
+    w = walk(rules)
+    r = w(
+        {
+            "id.a": [{"@value": "1"}],
+            "id.b": [{"@value": "2"}, {"@value": "1"}],
+            "name.x": ["aap"],
+        }
+    )
+    assert r == {
+        "identifier": ({"@value": "1"}, {"@value": "2"}, {"@value": "1"}),
+        "name": ("AAP",),
+    }
+    r = w({"id.c": [{"@value": "3"}], "name.y": ["noot"]}, accu=r)
+    assert r == {
+        "identifier": (
+            {"@value": "1"},
+            {"@value": "2"},
+            {"@value": "1"},
+            {"@value": "3"},
+        ),
+        "name": ("AAP", "NOOT"),
+    }
+    r = w(
+        {
+            "other.a": [
+                {"@value": "1", "@language": "nl"},
+                {"@language": "nl", "@value": "1"},
+                {"@value": "1"},
+            ]
+        }
+    )
+    assert r == {"identifier": ({"@value": "1", "@language": "nl"}, {"@value": "1"})}
+    assert type(r["identifier"]) is tuple
+    r = w(
+        {
+            "other.a": [{"@value": 1}],
+            "other.b": [{"@value": True}, {"@value": 1.0}, {"@value": 1}],
+        }
+    )
+    assert r == {"identifier": ({"@value": 1}, {"@value": True}, {"@value": 1.0})}
+    assert [type(o["@value"]) for o in r["identifier"]] == [int, bool, float]
+
+
+def test_collect_and_map_predicate2():
+    rules = {
+        "a": collect("x"),
+        "b": map_predicate2("x"),
+        "__finalize__": freeze,
+    }
+    assert walk(rules)({"a": [1], "b": [2, 3]}) == {"x": (1, 2, 3)}
+    assert walk(rules)({"b": [2], "a": [1]}) == {"x": (2, 1)}
+
+
+def test_collect_many_values_linear():
+    rules = {"*": collect("all"), "__finalize__": freeze}
+    r = walk(rules)({f"p{i}": [{"@value": i}] for i in range(10000)})
+    assert len(r["all"]) == 10000
+
+
+def test_declarative_rules():
+    rules = {
+        "@id": ignore_silently,
+        "a": identity,
+        "b": rename("B"),
+        "c": first_value("C"),
+        "d": collect("D"),
+        "e": collect("D", normalize=lambda os: [o * 2 for o in os]),
+        "f": nest_into("F", {"x": identity, "y": rename("Y")}),
+        "g": nest_into(None, {"*": identity}),
+        "h": lambda a, s, p, os, **opts: a | {"H": len(os)},
+        "__finalize__": freeze,
+    }
+    subject = {
+        "@id": "ignored",
+        "a": [1],
+        "b": [2],
+        "c": [{"@value": 3}, {"@value": 4}],
+        "d": [5],
+        "e": [6],
+        "f": [{"x": [7]}, {"y": [8]}],
+        "g": [{"z": [9]}],
+        "h": [10, 11],
+    }
+    expected = {
+        "a": [1],
+        "B": [2],
+        "C": 3,
+        "D": (5, 12),
+        "F": [{"x": [7]}, {"Y": [8]}],
+        "g": [{"z": [9]}],
+        "H": 2,
+    }
+    assert walk(rules)(subject) == expected
+    assert walk(rules)(subject, x=1) == expected
+    assert walk(rules, stack=True)(subject) == expected
+    assert walk(rules, profile=True)(subject) == expected
+    assert walk({"*": rename("all")})({"a": [1], "b": [2]}) == {"all": [2]}
+
+    # they work as rule functions too
+    a = {}
+    assert rename("B")(a, {}, "b", [2]) is a
+    assert a == {"B": [2]}
+    assert first_value("C")({}, {}, "c", [{"@value": 3}]) == {"C": 3}
+    assert nest_into("F", {"x": identity})({}, {}, "f", [{"x": 1}]) == {"F": [{"x": 1}]}
+    assert freeze(collect("D")({"D": (1,)}, {}, "d", [2])) == {"D": (1, 2)}
+    assert map_predicate("B") == rename("B")
+    assert rename("B") != rename("C")
+    assert repr(collect("D")) == "collect('D', None, False)"
+
+
+def test_declarative_rules_are_inlined():
+    calls = []
+
+    class Counting(type(rename("x"))):
+        def __call__(self, *args, **opts):
+            calls.append(args)
+            return super().__call__(*args, **opts)
+
+    rules = {"a": rename("A"), "b": Counting("B"), "c": nest_into("C", {"d": identity})}
+    assert walk(rules)({"a": [1], "b": [2], "c": [{"d": 3}]}) == {
+        "A": [1],
+        "B": [2],
+        "C": [{"d": 3}],
+    }
+    assert len(calls) == 1  # only the subclass, which is not recognized as rename
+
+    with pytest.raises(Exception) as e:
+        walk({"c": nest_into("C", {"d": {"e": identity}})})({"c": [{"d": [{"f": 1}]}]})
+    assert str(e.value).startswith(
+        "LookupError: No rule for 'f' in {'e'} at:\n> c\n-> d\n--> f while processing:"
+    )
+
+
+def test_compile_cache():
+    from . import jsonldwalk3
+
+    sub = {"b": identity}
+    rules = {"a": sub, "c": {"b": identity}, "d": rename("D")}
+    h = compile(rules)
+    assert compile(dict(rules)) is h  # equal tables share one handle
+    assert h.rules["a"] is h.rules["c"] is compile(sub)  # also when nested
+    assert compile(rules | {"e": identity}) is not h
+    assert compile({"a": sub, "d": rename("D"), "c": sub}) is not h  # order matters
+    assert compile({"a": sub, "c": sub, "d": rename("E")}) is not h
+    assert compile({"a": sub, "c": {"b": lambda *a: a[0]}, "d": rename("D")}) is not h
+    assert compile(rules, profile=Profile()) is not h
+    assert fingerprint(rules) == (
+        ("a", (("b", identity),)),
+        ("c", (("b", identity),)),
+        ("d", rename("D")),
+    )
+
+    size = jsonldwalk3.compile_cache_size
+    try:
+        jsonldwalk3.compile_cache_size = 2
+        for n in range(5):
+            compile({str(n): identity})
+        assert len(jsonldwalk3._compile_cache) == 2
+        assert compile(rules) is h  # evicted, but still alive elsewhere
+        key = fingerprint({"gone": identity})
+        compile({"gone": identity})
+        for n in range(5):
+            compile({str(n): identity})
+        gc.collect()
+        assert key not in jsonldwalk3._compiled_in_use
+    finally:
+        jsonldwalk3.compile_cache_size = size
+
+
+def test_compile_unhashable_rules():
+    class Unhashable:
+        __hash__ = None
+
+        def __call__(self, a, s, p, os):
+            return a | {p: os}
+
+    rules = {"a": Unhashable()}
+    assert compile(rules) is not compile(rules)
+    assert walk(rules)({"a": [1]}) == {"a": [1]}
+
+
+def test_recursive_ref():
+    work = {
+        "__name__": "work",
+        "title": first_value("title"),
+        "isPartOf": nest_into("partOf", ref("work")),
+        "creator": nest_into("creator", ref("person")),
+        "person": {
+            "__name__": "person",
+            "name": lambda a, s, p, os, lang="nl": a | {"name": os[0][lang]},
+            "memberOf": nest_into("memberOf", ref("person")),
+        },
+    }
+    record = {
+        "title": [{"@value": "chapter"}],
+        "creator": [{"name": [{"nl": "a"}], "memberOf": [{"name": [{"nl": "b"}]}]}],
+        "isPartOf": [
+            {
+                "title": [{"@value": "book"}],
+                "isPartOf": [{"title": [{"@value": "serie"}]}],
+            }
+        ],
+    }
+    expected = {
+        "title": "chapter",
+        "creator": [{"name": "a", "memberOf": [{"name": "b"}]}],
+        "partOf": [{"title": "book", "partOf": [{"title": "serie"}]}],
+    }
+    assert walk(work)(record) == expected
+    assert walk(work, stack=True)(record) == expected
+    profiled = walk(work, profile=True)
+    assert profiled(record) == expected
+    assert profiled.profile.stats[("isPartOf",)][0] == 2
+    h = compile(work)
+    assert h.rules["creator"].handle is h.rules["person"]
+    assert h.rules["isPartOf"].handle is h
+
+    with pytest.raises(Exception) as e:
+        walk(work)(record, lang="en")  # opts are passed through
+    assert str(e.value).startswith(
+        "KeyError: 'en' at:\n> creator\n-> name while processing:"
+    )
+    record["isPartOf"][0]["isPartOf"][0]["x"] = [1]
+    with pytest.raises(Exception) as e:
+        walk(work)(record)
+    assert str(e.value).startswith(
+        "LookupError: No rule for 'x' in "
+    ) and "at:\n> isPartOf\n-> isPartOf\n--> x while processing:" in str(e.value)
+
+
+def test_ref_as_rule():
+    flat = {"__name__": "flat", "a": identity, "b": ref("flat")}
+    assert walk(flat)({"b": [{"a": [1], "b": [{"a": [2]}]}]}) == {"a": [2]}
+    assert compile(flat).rules["b"] is compile(flat)
+    catch_all = {"__name__": "all", "a": identity, "*": ref("all")}
+    assert walk(catch_all)({"x": [{"y": [{"a": [1]}]}]}) == {"a": [1]}
+    assert walk(catch_all, stack=True)({"x": [{"y": [{"a": [1]}]}]}) == {"a": [1]}
+
+    with pytest.raises(LookupError) as e:
+        compile({"a": {"b": ref("nope")}})
+    assert str(e.value) == "No rule table named 'nope' for ref('nope')"
+    with pytest.raises(ValueError):
+        compile({"__name__": "x", "a": {"__name__": "x", "b": identity}})
+
+
+def test_recursive_table_under_several_predicates():
+    person = {
+        "__name__": "person",
+        "name": first_value("name"),
+        "knows": nest_into("knows", ref("person")),
+    }
+    record = {
+        "creator": [
+            {"name": [{"@value": "a"}], "knows": [{"name": [{"@value": "b"}]}]}
+        ],
+        "publisher": [{"name": [{"@value": "c"}]}],
+    }
+    nested = {
+        "creator": nest_into("creator", person),
+        "publisher": nest_into("publisher", person),
+    }
+    assert walk(nested)(record) == {
+        "creator": [{"name": "a", "knows": [{"name": "b"}]}],
+        "publisher": [{"name": "c"}],
+    }
+    assert walk(nested, profile=True)(record) == walk(nested)(record)
+    h = compile(nested)
+    assert h.rules["creator"].handle is h.rules["publisher"].handle
+    flat = {"creator": person, "publisher": person}
+    assert walk(flat)(record) == {"name": "c", "knows": [{"name": "b"}]}
+    h = compile(flat)
+    assert h.rules["creator"] is h.rules["publisher"]
+    assert h.rules["creator"].rules["knows"].handle is h.rules["creator"]
+
+    with pytest.raises(ValueError) as e:
+        compile({"creator": person, "publisher": person | {"name": identity}})
+    assert str(e.value) == "Two rule tables named 'person'"
+
+
+def test_refs_are_not_shared_between_tables():
+    inner = {"b": ref("top")}
+    one = walk({"__name__": "top", "a": inner, "c": rename("one")})
+    two = walk({"__name__": "top", "a": inner, "c": rename("two")})
+    assert one({"a": [{"b": [{"c": [1]}]}]}) == {"one": [1]}
+    assert two({"a": [{"b": [{"c": [1]}]}]}) == {"two": [1]}
+
+
+def test_memoize():
+    walked = []
+
+    def name(a, s, p, os, lang="nl", **opts):
+        walked.append(os)
+        return a | {"name": os[0][lang]}
+
+    memo = memoize(size=2)
+    person = {"__memo__": memo, "@id": identity, "name": name}
+    rules = {"creator": nest_into("creator", person), "x": person}
+    w = walk(rules)
+    a = {"@id": ["a"], "name": [{"nl": "A", "en": "Ay"}]}
+    b = {"@id": ["b"], "name": [{"nl": "B"}]}
+    assert w({"creator": [a, b, dict(a)]}) == {
+        "creator": [
+            {"@id": ["a"], "name": "A"},
+            {"@id": ["b"], "name": "B"},
+            {"@id": ["a"], "name": "A"},
+        ]
+    }
+    assert len(walked) == 2
+    assert (memo.hits, memo.misses, memo.evictions) == (1, 2, 0)
+    result = w({"creator": [a]})
+    result["creator"][0]["name"] = "changed"
+    assert w({"creator": [a]}) == {"creator": [{"@id": ["a"], "name": "A"}]}
+    assert w({"creator": [a]}, lang="en") == {"creator": [{"@id": ["a"], "name": "Ay"}]}
+    assert (memo.hits, memo.misses, memo.evictions) == (3, 3, 1)
+    assert repr(memo) == "memoize(2, by='hash'): 3 hits, 3 misses, 1 evictions"
+
+    walked.clear()
+    assert w({"x": [b], "creator": [b]}) == {
+        "@id": ["b"],
+        "name": "B",
+        "creator": [{"@id": ["b"], "name": "B"}],
+    }
+    assert len(walked) == 1  # x walks into a fresh accu too, creator hits
+
+    assert w({"x": [b]}, accu={"y": 1}) == {"y": 1, "@id": ["b"], "name": "B"}
+    assert len(walked) == 2  # walking into a used accu is not memoised
+    w({"creator": [b]}, tags={"t"})  # unhashable opts are not either
+    assert (memo.hits, memo.misses, memo.evictions) == (4, 4, 2)
+
+
+def test_memoize_keeps_equal_values_of_other_types_apart():
+    memo = memoize()
+    w = walk({"p": nest_into("P", {"__memo__": memo, "v": identity})})
+    for v in (1, True, 1.0, 1):
+        r = w({"p": [{"v": [{"@value": v}]}]})
+        assert r == {"P": [{"v": [{"@value": v}]}]}
+        assert type(r["P"][0]["v"][0]["@value"]) is type(v)
+    assert (memo.hits, memo.misses) == (1, 3)
+
+
+def test_memoize_with_stack_engine():
+    memo = memoize()
+    for stack in (False, True):
+        w = walk({"a": {"b": identity, "__memo__": memo}}, stack=stack)
+        for _ in range(3):
+            assert w({"a": [{"b": [1]}]}) == {"b": [1]}
+    assert (memo.hits, memo.misses) == (5, 1)
+    memo = memoize()
+    w = walk({"b": identity, "__memo__": memo}, stack=True)
+    assert w({"b": [1]}) == w({"b": [1]}) == {"b": [1]}
+    assert (memo.hits, memo.misses) == (1, 1)
+
+
+def test_memoize_by_id():
+    memo = memoize(by="@id")
+    w = walk({"creator": nest_into("creator", {"__memo__": memo, "@id": identity})})
+    assert w({"creator": [{"@id": "a"}, {"@id": "a"}, {"@id": "b"}]}) == {
+        "creator": [{"@id": "a"}, {"@id": "a"}, {"@id": "b"}]
+    }
+    assert (memo.hits, memo.misses) == (1, 2)
+    with pytest.raises(Exception) as e:
+        w({"creator": [{"x": [1]}]})
+    assert str(e.value).startswith("LookupError: No rule for 'x'")
+    assert (memo.hits, memo.misses) == (1, 2)  # no @id, no memo
+    with pytest.raises(ValueError):
+        memoize(by="name")
+
+
+def test_specialize_on_shapes():
+    calls = []
+    rules = {
+        "@id": identity,
+        "name": rename("Name"),
+        "sub": {"x": lambda a, s, p, os, **opts: calls.append(opts) or a | {"X": os}},
+        "*": ignore_silently,
+    }
+    record = {"@id": "a", "name": [1], "other": [2], "sub": [{"x": [3]}]}
+    sampled = walk(rules, profile=True)
+    for _ in range(3):
+        sampled(record)
+    sampled({"@id": "b"})
+    assert sampled.profile.shapes == {
+        (): {("@id", "name", "other", "sub"): 3, ("@id",): 1},
+        ("sub",): {("x",): 3},
+    }
+    shapes = sampled.profile.hot_shapes()
+    assert shapes == {(): ("@id", "name", "other", "sub"), ("sub",): ("x",)}
+    assert sampled.profile.hot_shapes(min_share=0.8) == {("sub",): ("x",)}
+
+    w = walk(rules, shapes=shapes)
+    assert compile(rules, shapes=shapes).__code__.co_filename == (
+        "<jsonldwalk3 handle sparse[identity,rename]"
+        "+shape[identity,rename,ignore,call]>"
+    )
+    expected = {"@id": "a", "Name": [1], "X": [3]}
+    assert w(record) == expected
+    assert w(record, y=1) == expected
+    assert calls[-1] == {"y": 1}
+    assert w({"name": [1], "@id": "a"}) == {"Name": [1], "@id": "a"}  # generic
+
+    with pytest.raises(Exception) as e:
+        w(record | {"sub": [{"y": [4]}]})
+    assert str(e.value).startswith("LookupError: No rule for 'y' in ")
+    assert "at:\n> sub\n-> y while processing:" in str(e.value)
+
+
+def test_fan_out():
+    calls = []
+
+    def count(a, s, p, os, **opts):
+        calls.append((p, opts))
+        a[p] = len(os)
+        return a
+
+    index = {
+        "@id": identity,
+        "name": collect("names"),
+        "creator": {"name": collect("names"), "*": ignore_silently},
+        "__finalize__": freeze,
+        "*": ignore_silently,
+    }
+    display = {
+        "name": first_value("title"),
+        "creator": nest_into(
+            "creators", {"name": first_value("name"), "*": ignore_silently}
+        ),
+        "*": ignore_silently,
+    }
+    links = {
+        "creator": {"@id": count, "*": ignore_silently},
+        "subject": count,
+        "*": ignore_silently,
+    }
+    switched = {"__switch__": "@type", "*": {"@type": count, "*": ignore_silently}}
+    record = {
+        "@id": "a",
+        "@type": ["Book"],
+        "name": [{"@value": "A"}],
+        "creator": [{"@id": "c", "name": [{"@value": "C"}]}],
+        "subject": [{"@id": "s"}],
+    }
+    tables = dict(index=index, display=display, links=links, switched=switched)
+    expected = {name: walk(rules)(record) for name, rules in tables.items()}
+    assert expected["links"] == {"@id": 1, "subject": 1}
+    calls.clear()
+
+    w = walk(fan_out(**tables))
+    assert w(record) == expected
+    assert w(record, lang="nl") == expected
+    assert calls[-1] == ("@type", {"lang": "nl"})
+    assert walk(fan_out(**tables), stack=True)(record) == expected
+    accu = {"index": {}, "display": {"x": 1}, "links": {}, "switched": {}}
+    assert w(record, accu=accu)["display"] == {"x": 1} | expected["display"]
+    assert list(walk_many(fan_out(**tables), [record, record])) == [expected] * 2
+
+    # the nested tables of index and links for creator walk as one
+    fan = _compile_fan([index, links])
+    assert fan.__code__.co_filename == (
+        "<jsonldwalk3 handle fan[collect,identity]+sparse+nested+finalize>"
+    )
+
+    errors = []
+    failing = fan_out(index=index, strict={"@id": identity})
+    assert list(walk_many(failing, [record], errors=errors.append)) == []
+    assert errors[0]["message"] == "No rule for '@type' in {'@id'}"
+    assert errors[0]["path"] == ["@type"]
@@ -0,0 +1,142 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+
+from time import perf_counter
+import gzip
+import json
+import sys
+
+from .jsonldwalk3 import walk_many, loads_interned
+
+
+def open_jsonlines(path, mode="rb", buffer_size=1 << 20):
+    """opens path for reading or writing lines, gzip compressed when it starts
+    with the gzip magic (reading) or its name ends with .gz (writing)"""
+    if "r" in mode:
+        with open(path, "rb") as f:
+            compressed = f.read(2) == b"\x1f\x8b"
+    else:
+        compressed = str(path).endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode)
+    return open(path, mode, buffering=buffer_size)
+
+
+def read_jsonlines(path, buffer_size=1 << 20, interned=False):
+    """yields the records from a JSON-lines file one at a time; with interned
+    their keys, @type and @language are interned, see intern_record(), which
+    saves memory when records are kept but parses up to twice as slow"""
+    loads = loads_interned if interned else json.loads
+    with open_jsonlines(path, "rb", buffer_size=buffer_size) as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def skip_until(records, resume_after):
+    """yields the records after the one with @id resume_after"""
+    records = iter(records)
+    for record in records:
+        if record.get("@id") == resume_after:
+            yield from records
+            return
+    raise LookupError(f"Record '{resume_after}' not found")
+
+
+def print_rate(last, records, rate, file=sys.stderr):
+    print(f"LAST: {last}\nRECORDS: {records}\nRATE: {rate}", file=file, flush=True)
+
+
+def walk_jsonlines(
+    rules,
+    inpath,
+    outpath,
+    resume_after=None,
+    report=None,
+    report_every=10000,
+    batch_size=1000,
+    buffer_size=1 << 20,
+    interned=False,
+    **opts,
+):
+    """walks every record from JSON-lines file inpath with rules and writes
+    the results as JSON-lines to outpath. Records are streamed, so memory
+    stays flat regardless of the size of the input. With resume_after, the
+    records up to and including the one with that @id are skipped and the
+    results are appended to outpath. Every report_every records, report (for
+    example print_rate) is called with the @id of the last record written,
+    the number of records and the records/s so far; the results are flushed
+    to outpath first, so resuming after that @id loses nothing, also when a
+    later record fails. Records are loaded with interned as in
+    read_jsonlines(), which makes parsing slower and walking no faster.
+    Returns the number of records and the last @id.
+    """
+    last = resume_after
+    n = 0
+    records = read_jsonlines(inpath, buffer_size=buffer_size, interned=interned)
+    if resume_after is not None:
+        records = skip_until(records, resume_after)
+
+    def counted(records):
+        nonlocal last, n
+        for record in records:
+            last = record.get("@id")
+            n += 1
+            yield record
+
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    mode = "wb" if resume_after is None else "ab"
+    t0 = perf_counter()
+    with open_jsonlines(outpath, mode, buffer_size=buffer_size) as out:
+        batch = []
+        batch_last, batch_n = resume_after, 0  # of the last result in batch
+        next_report, reported = report_every, None
+
+        def write(flush=False):
+            if batch:
+                out.write(("\n".join(batch) + "\n").encode())
+                batch.clear()
+            if flush:
+                out.flush()
+
+        try:
+            for result in walk_many(rules, counted(records), **opts):
+                batch.append(dumps(result))
+                batch_last, batch_n = last, n
+                if report is not None and n >= next_report:  # also after errors
+                    write(flush=True)
+                    report(batch_last, batch_n, batch_n / (perf_counter() - t0))
+                    next_report = (n // report_every + 1) * report_every
+                    reported = (batch_last, batch_n)
+                elif len(batch) >= batch_size:
+                    write()
+        finally:
+            write()  # the results so far, also when a record fails
+    if report is not None and reported != (last, n):
+        report(last, n, n / (perf_counter() - t0))
+    return n, last
+
+
+__all__ = ["walk_jsonlines", "read_jsonlines", "print_rate"]
@@ -0,0 +1,154 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+
+from .jsonlines import walk_jsonlines, read_jsonlines, print_rate
+import gzip
+import io
+import json
+import pytest
+
+rules = {
+    "@id": lambda a, s, p, os, **_: a | {p: os},
+    "a": lambda a, s, p, os, x=1: a | {"b": [x * o for o in os]},
+}
+
+
+def write(path, records, open=open):
+    with open(path, "wt") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def test_walk_jsonlines(tmp_path):
+    write(tmp_path / "in.jsonl", [{"@id": f"id:{i}", "a": [i]} for i in range(5)])
+    reported = []
+    n, last = walk_jsonlines(
+        rules,
+        tmp_path / "in.jsonl",
+        tmp_path / "out.jsonl",
+        report=lambda *a: reported.append(a),
+        report_every=2,
+        batch_size=3,
+        x=10,
+    )
+    assert (n, last) == (5, "id:4")
+    assert list(read_jsonlines(tmp_path / "out.jsonl")) == [
+        {"@id": f"id:{i}", "b": [10 * i]} for i in range(5)
+    ]
+    assert [r[:2] for r in reported] == [("id:1", 2), ("id:3", 4), ("id:4", 5)]
+    assert all(rate > 0 for _, _, rate in reported)
+
+
+def test_report_after_errors(tmp_path):
+    records = [{"@id": f"id:{i}", "a": [i]} for i in range(10)]
+    records[3]["x"] = [1]  # the 4th record fails
+    write(tmp_path / "in.jsonl", records)
+    reported, errors = [], []
+    walk_jsonlines(
+        rules,
+        tmp_path / "in.jsonl",
+        tmp_path / "out.jsonl",
+        report=lambda *a: reported.append(a),
+        report_every=2,
+        errors=errors.append,
+    )
+    assert len(errors) == 1
+    assert [r[:2] for r in reported] == [
+        ("id:1", 2),
+        ("id:4", 5),
+        ("id:5", 6),
+        ("id:7", 8),
+        ("id:9", 10),
+    ]
+
+
+def test_gzip_and_resume(tmp_path):
+    write(
+        tmp_path / "in.jsonl.gz",
+        [{"@id": f"id:{i}", "a": [i]} for i in range(5)],
+        open=gzip.open,
+    )
+    walk_jsonlines(rules, tmp_path / "in.jsonl.gz", tmp_path / "out.jsonl.gz")
+    with gzip.open(tmp_path / "out.jsonl.gz") as f:
+        assert len(f.readlines()) == 5
+
+    write(tmp_path / "out.jsonl", [{"@id": "id:0", "b": [0]}])
+    n, last = walk_jsonlines(
+        rules, tmp_path / "in.jsonl.gz", tmp_path / "out.jsonl", resume_after="id:0"
+    )
+    assert (n, last) == (4, "id:4")
+    assert [r["@id"] for r in read_jsonlines(tmp_path / "out.jsonl")] == [
+        f"id:{i}" for i in range(5)
+    ]
+    with pytest.raises(LookupError):
+        walk_jsonlines(
+            rules, tmp_path / "in.jsonl.gz", tmp_path / "x.jsonl", resume_after="id:9"
+        )
+
+
+def test_report_and_failure_leave_resumable_output(tmp_path):
+    records = [{"@id": f"id:{i}", "a": [i]} for i in range(10)]
+    write(tmp_path / "in.jsonl", records + [{"@id": "id:10", "x": [1]}])
+    on_disk = []
+
+    def report(last, n, rate):
+        with open(tmp_path / "out.jsonl") as f:
+            on_disk.append((last, n, len(f.readlines())))
+
+    with pytest.raises(Exception):
+        walk_jsonlines(
+            rules,
+            tmp_path / "in.jsonl",
+            tmp_path / "out.jsonl",
+            report=report,
+            report_every=5,
+            batch_size=4,
+        )
+    assert on_disk == [("id:4", 5, 5), ("id:9", 10, 10)]
+    assert len(list(read_jsonlines(tmp_path / "out.jsonl"))) == 10
+
+    write(tmp_path / "in.jsonl", records + [{"@id": "id:10", "a": [10]}])
+    walk_jsonlines(
+        rules, tmp_path / "in.jsonl", tmp_path / "out.jsonl", resume_after="id:9"
+    )
+    assert [r["@id"] for r in read_jsonlines(tmp_path / "out.jsonl")] == [
+        f"id:{i}" for i in range(11)
+    ]
+
+
+def test_print_rate():
+    f = io.StringIO()
+    print_rate("id:4", 5, 8417.5, file=f)
+    assert f.getvalue() == "LAST: id:4\nRECORDS: 5\nRATE: 8417.5\n"
+
+
+def test_read_interned(tmp_path):
+    write(
+        tmp_path / "in.jsonl", [{"http://schema.org/name": [{"@language": "nl"}]}] * 2
+    )
+    r1, r2 = read_jsonlines(tmp_path / "in.jsonl", interned=True)
+    (k1,), (k2,) = r1, r2
+    assert k1 is k2
+    assert r1[k1][0]["@language"] is r2[k2][0]["@language"]
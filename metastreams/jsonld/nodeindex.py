@@ -0,0 +1,152 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from operator import is_
+
+""" An index of the nodes of (flattened) JSON-LD graphs by @id, nested nodes
+included, with which nodes refer to which. A dict with only an @id is a
+reference to the node with that @id; resolve() embeds the nodes referred to,
+so flattened graphs can be walked as if embedded, see walk(index=...). """
+
+
+class NodeIndex:
+    def __init__(self, graph=None):
+        self.nodes = {}  # @id -> node
+        self.referenced_by = {}  # @id -> @ids of the nodes referring to it
+        self._references = {}  # @id -> @ids the node refers to
+        self._resolved = {}  # @id -> resolved node, see resolve()
+        if graph is not None:
+            self.add(graph)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, id):
+        return id in self.nodes
+
+    def __getitem__(self, id):
+        return self.nodes[id]
+
+    def get(self, id, default=None):
+        return self.nodes.get(id, default)
+
+    def add(self, graph):
+        """indexes the nodes in graph (a document with @graph, a list of nodes
+        or a node) and the nodes nested in them. A node replaces the one with
+        the same @id that was indexed before."""
+        if isinstance(graph, dict):
+            graph = graph.get("@graph", (graph,))
+        if isinstance(graph, dict):
+            graph = (graph,)
+        self._resolved.clear()
+        todo = [(node, None, True) for node in reversed(graph)]
+        push = todo.append
+        pop = todo.pop
+        while todo:
+            node, owner, top = pop()
+            id = node.get("@id")
+            if id is not None:
+                if owner is not None:
+                    self._refer(owner, id)
+                if len(node) == 1 and not top:  # a reference
+                    continue
+                self._unrefer(id)
+                self.nodes[id] = node
+                owner = id
+            for p, os in node.items():
+                if type(os) is dict:
+                    push((os, owner, False))
+                elif type(os) is list or type(os) is tuple:
+                    for o in os:
+                        if type(o) is dict:
+                            push((o, owner, False))
+
+    def remove(self, id):
+        """removes the node with id and the references it makes, returning it;
+        the nodes nested in it stay, as others may refer to them"""
+        self._resolved.clear()
+        self._unrefer(id)
+        return self.nodes.pop(id)
+
+    def _refer(self, owner, id):
+        self._references.setdefault(owner, set()).add(id)
+        self.referenced_by.setdefault(id, set()).add(owner)
+
+    def _unrefer(self, owner):
+        for id in self._references.pop(owner, ()):
+            referring = self.referenced_by[id]
+            referring.discard(owner)
+            if not referring:
+                del self.referenced_by[id]
+
+    def resolve(self, node):
+        """node with the references in it replaced by the nodes they refer to,
+        recursively. A reference to a node that is being resolved already, a
+        cycle, stays a reference, as do references to unknown nodes. Nodes are
+        resolved once and shared until the index changes; do not modify them."""
+        return self._resolve(node, set())[0]
+
+    def _resolve(self, node, path):
+        """returns node resolved and whether no cycle was cut short in it"""
+        id = node.get("@id")
+        indexed = id is not None and self.nodes.get(id)
+        if indexed:
+            if len(node) == 1:
+                node = indexed
+            if node is indexed:
+                if id in self._resolved:
+                    return self._resolved[id], True
+                if id in path:
+                    return {"@id": id}, False
+                path.add(id)
+        complete = True
+        resolved = None
+        for p, os in node.items():
+            if type(os) is dict:
+                r, c = self._resolve(os, path)
+            elif type(os) is list or type(os) is tuple:
+                r = []
+                c = True
+                for o in os:
+                    if type(o) is dict:
+                        o, oc = self._resolve(o, path)
+                        c = c and oc
+                    r.append(o)
+                r = os if all(map(is_, r, os)) else type(os)(r)
+            else:
+                continue
+            complete = complete and c
+            if r is not os:
+                if resolved is None:
+                    resolved = dict(node)
+                resolved[p] = r
+        resolved = node if resolved is None else resolved
+        if indexed and node is indexed:
+            path.discard(id)
+            if complete:  # what is resolved within a cycle depends on the path
+                self._resolved[id] = resolved
+        return resolved, complete
+
+
+__all__ = ["NodeIndex"]
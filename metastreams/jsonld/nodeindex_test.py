@@ -0,0 +1,128 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from pyld import jsonld
+
+from .jsonldwalk3 import walk, walk_many, identity, nest_into, first_value
+from .nodeindex import NodeIndex
+
+dcterms = "http://purl.org/dc/terms/"
+foaf = "http://xmlns.com/foaf/0.1/"
+
+
+def test_index_nested_nodes():
+    index = NodeIndex(
+        {
+            "@graph": [
+                {"@id": "a", "p": [{"@id": "b", "q": [{"@id": "c"}]}]},
+                {"@id": "c", "r": {"@id": "a"}, "s": [{"@value": 1}]},
+            ]
+        }
+    )
+    assert len(index) == 3
+    assert set(index.nodes) == {"a", "b", "c"}
+    assert index["b"] == {"@id": "b", "q": [{"@id": "c"}]}
+    assert index["c"]["s"] == [{"@value": 1}]  # not the reference
+    assert index.referenced_by == {"b": {"a"}, "c": {"b"}, "a": {"c"}}
+    assert "d" not in index and index.get("d") is None
+
+
+def test_add_and_remove():
+    index = NodeIndex([{"@id": "a", "p": [{"@id": "b"}]}])
+    assert index.referenced_by == {"b": {"a"}}
+    assert "b" not in index
+    index.add({"@id": "b", "q": [{"@id": "a"}]})
+    assert index.referenced_by == {"b": {"a"}, "a": {"b"}}
+    index.add({"@id": "a", "p": [{"@id": "c"}]})  # replaces a
+    assert index.referenced_by == {"c": {"a"}, "a": {"b"}}
+    assert index.remove("b") == {"@id": "b", "q": [{"@id": "a"}]}
+    assert index.referenced_by == {"c": {"a"}}
+    assert set(index.nodes) == {"a"}
+
+
+def test_resolve():
+    index = NodeIndex(
+        [
+            {"@id": "a", "p": [{"@id": "b"}, {"@value": 1}], "x": ({"@id": "x"},)},
+            {"@id": "b", "q": [{"@id": "c"}]},
+            {"@id": "c", "r": [{"@value": 2}]},
+        ]
+    )
+    a = index.resolve({"@id": "a"})
+    assert a == {
+        "@id": "a",
+        "p": [{"@id": "b", "q": [{"@id": "c", "r": [{"@value": 2}]}]}, {"@value": 1}],
+        "x": ({"@id": "x"},),  # unknown, stays a reference
+    }
+    assert a["p"][1] is index["a"]["p"][1]  # unchanged parts are not copied
+    assert a["x"] is index["a"]["x"]
+    assert index.resolve(index["a"]) is a  # memoised
+    assert index.resolve({"@id": "c"}) is index["c"]
+    assert index["a"]["p"][0] == {"@id": "b"}  # the index is left alone
+    index.add({"@id": "c", "r": [{"@value": 3}]})
+    assert index.resolve({"@id": "a"})["p"][0]["q"][0]["r"] == [{"@value": 3}]
+
+
+def test_resolve_cycles():
+    index = NodeIndex(
+        [
+            {"@id": "a", "knows": [{"@id": "b"}]},
+            {"@id": "b", "knows": [{"@id": "a"}, {"@id": "b"}]},
+        ]
+    )
+    assert index.resolve({"@id": "a"}) == {
+        "@id": "a",
+        "knows": [{"@id": "b", "knows": [{"@id": "a"}, {"@id": "b"}]}],
+    }
+    assert index.resolve({"@id": "b"}) == {
+        "@id": "b",
+        "knows": [{"@id": "a", "knows": [{"@id": "b"}]}, {"@id": "b"}],
+    }
+    assert index._resolved == {}  # both depend on where they are resolved from
+
+
+def test_walk_flattened_as_embedded():
+    doc = {
+        f"{dcterms}title": "Title",
+        f"{dcterms}creator": {f"{foaf}name": "Piet Pietersen"},
+    }
+    flat = jsonld.expand(jsonld.flatten(doc, {}), {})
+    index = NodeIndex(flat)
+    assert index.referenced_by == {"_:b1": {"_:b0"}}
+    rules = {
+        "@id": identity,
+        f"{dcterms}title": first_value("title"),
+        f"{dcterms}creator": nest_into(
+            "creator", {"@id": identity, f"{foaf}name": first_value("name")}
+        ),
+    }
+    expected = {
+        "@id": "_:b0",
+        "title": "Title",
+        "creator": [{"@id": "_:b1", "name": "Piet Pietersen"}],
+    }
+    assert walk(rules, index=index)(index["_:b0"]) == expected
+    assert walk(rules, index=index)({"@id": "_:b0"}) == expected
+    roots = [node for id, node in index.nodes.items() if id not in index.referenced_by]
+    assert list(walk_many(rules, roots, index=index)) == [expected]
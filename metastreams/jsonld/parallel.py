@@ -0,0 +1,103 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from importlib import import_module
+from itertools import islice
+from functools import reduce
+from os import cpu_count
+
+from .jsonldwalk3 import walk_many
+
+
+def resolve(rules_ref):
+    """finds the rules named by 'package.module:name' (name may be dotted)"""
+    module, _, name = rules_ref.partition(":")
+    if not name:
+        raise ValueError(f"Expected 'module:name', got '{rules_ref}'")
+    return reduce(getattr, name.split("."), import_module(module))
+
+
+_rules = {}  # per worker process
+
+
+def walk_chunk(rules_ref, records, walk_opts, opts):
+    """walks records in a worker, returning the results and error records"""
+    if rules_ref not in _rules:
+        _rules[rules_ref] = resolve(rules_ref)
+    errors = []
+    walk_opts = walk_opts | {"errors": errors.append if walk_opts["errors"] else None}
+    results = list(walk_many(_rules[rules_ref], records, **walk_opts, **opts))
+    return results, errors
+
+
+def chunks(records, chunksize):
+    records = iter(records)
+    while chunk := list(islice(records, chunksize)):
+        yield chunk
+
+
+def walk_parallel(
+    rules_ref,
+    records,
+    workers=None,
+    chunksize=1000,
+    catch=True,
+    stack=False,
+    errors=None,
+    max_subject=None,
+    **opts,
+):
+    """walks records in a pool of worker processes, yielding the results in
+    the order of records. The rules are given as 'package.module:name' so the
+    workers can import them instead of receiving pickled rules. Only a few
+    chunks per worker are read ahead from records. With errors, failing
+    records are skipped and their error records passed to errors, as with
+    walk_many()."""
+    workers = workers or cpu_count()
+    walk_opts = dict(
+        catch=catch, stack=stack, errors=errors is not None, max_subject=max_subject
+    )
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    def results(future):
+        results, errs = future.result()
+        for error in errs:
+            errors(error)
+        return results
+
+    try:
+        pending = deque()
+        for chunk in chunks(records, chunksize):
+            pending.append(pool.submit(walk_chunk, rules_ref, chunk, walk_opts, opts))
+            if len(pending) > 2 * workers:
+                yield from results(pending.popleft())
+        while pending:
+            yield from results(pending.popleft())
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+__all__ = ["walk_parallel"]
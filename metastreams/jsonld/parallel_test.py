@@ -0,0 +1,90 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+from .jsonldwalk3 import walk, identity
+from .parallel import walk_parallel, resolve, chunks
+import pytest
+
+rules = {
+    "@id": lambda a, s, p, os, **opts: a | {p: os},
+    "n": lambda a, s, p, os, factor=1: a | {p: [o * factor for o in os]},
+    "sub": {"b": identity},
+}
+
+
+def test_resolve():
+    assert resolve("metastreams.jsonld.parallel_test:rules") is rules
+    assert resolve("metastreams.jsonld.parallel_test:walk.__name__") == "walk"
+    with pytest.raises(ValueError):
+        resolve("metastreams.jsonld.parallel_test.rules")
+
+
+def test_chunks():
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunks([], 2)) == []
+
+
+def test_walk_parallel_keeps_order():
+    records = [{"@id": i, "n": [i]} for i in range(100)]
+    results = walk_parallel(
+        "metastreams.jsonld.parallel_test:rules",
+        iter(records),
+        workers=3,
+        chunksize=7,
+        factor=2,
+    )
+    assert list(results) == [{"@id": i, "n": [2 * i]} for i in range(100)]
+
+
+def test_walk_parallel_errors_like_walk():
+    records = [{"@id": 1}, {"sub": [{"c": 42}]}]
+    with pytest.raises(Exception) as local:
+        [walk(rules)(r) for r in records]
+    with pytest.raises(Exception) as remote:
+        list(
+            walk_parallel("metastreams.jsonld.parallel_test:rules", records, workers=2)
+        )
+    assert str(remote.value) == str(local.value)
+    assert str(remote.value).startswith("LookupError: No rule for 'c' in {'b'} at:")
+
+
+def test_walk_parallel_collects_errors():
+    records = [{"@id": 1}, {"@id": 2, "sub": [{"c": 42}]}, {"@id": 3}]
+    errors = []
+    results = walk_parallel(
+        "metastreams.jsonld.parallel_test:rules",
+        records,
+        workers=2,
+        chunksize=1,
+        errors=errors.append,
+    )
+    assert list(results) == [{"@id": 1}, {"@id": 3}]
+    assert errors == [
+        {
+            "type": "LookupError",
+            "message": "No rule for 'c' in {'b'}",
+            "path": ["sub", "c"],
+            "id": 2,
+        }
+    ]
@@ -0,0 +1,200 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+import json
+
+from .jsonldwalk3 import compile, walker, walk_error, error_record
+
+""" Instead of building an accu, rules can send events to a sink passed as
+the opt sink: start_node(), predicate(p), value(o) and end_node(). The sinks
+here write the nodes as JSON, with a list of values per predicate, without
+building them as dicts first. Send each predicate once per node; there is no
+merging afterwards. """
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class JsonSink:
+    """writes the top level nodes as a JSON array to the text stream, a node
+    at a time; call close() (or use it as a context manager) to end it"""
+
+    _open, _separator, _close = "[", ",", "]"
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.nodes = 0
+        self._parts = []  # of the top level node being written
+        self._stack = []  # per open node: [predicates, values, -1 or -2 for single]
+
+    def start_node(self):
+        stack = self._stack
+        if stack:
+            self.value_separator()
+        else:
+            self._parts.append(self._separator if self.nodes else self._open)
+        self._parts.append("{")
+        stack.append([0, -1])
+
+    def predicate(self, p, single=False):
+        """starts the list of values of p; with single, p has one value that
+        is written as is, like the @id of a node"""
+        state = self._stack[-1]
+        parts = self._parts
+        if state[1] >= 0:
+            parts.append("]")
+        if state[0]:
+            parts.append(",")
+        parts.append(_dumps(p))
+        state[0] += 1
+        if single:
+            parts.append(":")
+            state[1] = -2
+        else:
+            parts.append(":[")
+            state[1] = 0
+
+    def value_separator(self):
+        state = self._stack[-1]
+        if state[1] == -2:  # the single value
+            state[1] = -1
+            return
+        if state[1] < 0:
+            raise ValueError("Value without predicate")
+        if state[1]:
+            self._parts.append(",")
+        state[1] += 1
+
+    def value(self, o):
+        self.value_separator()
+        self._parts.append(_dumps(o))
+
+    def values(self, os):
+        """value() for each of os, encoded at once"""
+        if os:
+            state = self._stack[-1]
+            if state[1] < 0:
+                raise ValueError("Values without predicate")
+            if state[1]:
+                self._parts.append(",")
+            state[1] += len(os)
+            self._parts.append(_dumps(list(os))[1:-1])
+
+    def end_node(self):
+        state = self._stack.pop()
+        parts = self._parts
+        parts.append("]}" if state[1] >= 0 else "}")
+        if not self._stack:
+            self.nodes += 1
+            self.stream.write("".join(parts))
+            parts.clear()
+
+    def discard(self):
+        """forgets the top level node being written, e.g. after an error"""
+        self._parts.clear()
+        self._stack.clear()
+
+    def close(self):
+        if self._stack:
+            raise ValueError("Closing with open nodes")
+        self.stream.write(self._close if self.nodes else "[]")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+
+
+class JsonLinesSink(JsonSink):
+    """writes each top level node as a line of JSON to the text stream"""
+
+    _open, _separator, _close = "", "\n", "\n"
+
+    def close(self):
+        if self._stack:
+            raise ValueError("Closing with open nodes")
+        if self.nodes:
+            self.stream.write("\n")
+
+
+def emit(p=None):
+    """sends the objects to the sink as the values of p (or the predicate);
+    a string, like an @id, is sent as a single value"""
+
+    def emit_fn(a, s, p_, os, sink, **opts):
+        if type(os) is str:
+            sink.predicate(p_ if p is None else p, single=True)
+            sink.value(os)
+            return a
+        sink.predicate(p_ if p is None else p)
+        sink.values(os)
+        return a
+
+    return emit_fn
+
+
+def emit_into(p, rules):
+    """sends each object to the sink as a node walked with rules, as a value
+    of p (or the predicate); the sink version of nest_into()"""
+    handle = compile(rules)
+
+    def emit_into_fn(a, s, p_, os, sink, **opts):
+        sink.predicate(p_ if p is None else p)
+        for o in os:
+            sink.start_node()
+            handle({}, None, None, (o,), sink=sink, **opts)
+            sink.end_node()
+        return a
+
+    return emit_into_fn
+
+
+def walk_into(
+    rules, records, sink, catch=True, stack=False, errors=None, max_subject=None, **opts
+):
+    """walks each of records with rules sending events to sink, each record
+    as a top level node. With errors, a failing record is discarded from the
+    sink and its error_record() passed to errors, as with walk_many(). Returns
+    the number of records written."""
+    w = walker(rules, stack=stack)
+    n = 0
+    for record in records:
+        sink.start_node()
+        try:
+            w({}, None, None, (record,), sink=sink, **opts)
+        except Exception as e:
+            sink.discard()
+            if errors is not None:
+                errors(error_record(e, record, max_subject=max_subject))
+                continue
+            if catch:
+                raise walk_error(e, record) from e
+            raise e
+        sink.end_node()
+        n += 1
+    return n
+
+
+__all__ = ["JsonSink", "JsonLinesSink", "emit", "emit_into", "walk_into"]
@@ -0,0 +1,125 @@
+## begin license ##
+#
+# "Metastreams Json LD" provides utilities for handling json-ld data structures
+#
+# Copyright (C) 2026 Seecr (Seek You Too B.V.) https://seecr.nl
+#
+# This file is part of "Metastreams Json LD"
+#
+# "Metastreams Json LD" is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# "Metastreams Json LD" is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with "Metastreams Json LD"; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+#
+## end license ##
+
+import io
+import json
+import pytest
+
+from .jsonldwalk3 import walk_many, identity, nest_into, ignore_silently
+from .sinks import JsonSink, JsonLinesSink, emit, emit_into, walk_into
+
+records = [
+    {
+        "@id": "a",
+        "name": [{"@value": "ä"}],
+        "creator": [{"name": [{"@value": "b"}], "x": [1]}, {"name": []}],
+    },
+    {"@id": "c", "x": [2]},
+]
+
+sink_rules = {
+    "@id": emit(),
+    "name": emit("title"),
+    "creator": emit_into(None, {"name": emit(), "*": ignore_silently}),
+    "*": ignore_silently,
+}
+
+dict_rules = {
+    "@id": identity,
+    "name": lambda a, s, p, os: a | {"title": os},
+    "creator": nest_into(None, {"name": identity, "*": ignore_silently}),
+    "*": ignore_silently,
+}
+
+
+def test_json_sink():
+    out = io.StringIO()
+    with JsonSink(out) as sink:
+        assert walk_into(sink_rules, records, sink) == 2
+    assert json.loads(out.getvalue()) == list(walk_many(dict_rules, records))
+    assert '"ä"' in out.getvalue()
+
+    out = io.StringIO()
+    with JsonSink(out):
+        pass
+    assert out.getvalue() == "[]"
+
+
+def test_json_lines_sink():
+    out = io.StringIO()
+    with JsonLinesSink(out) as sink:
+        walk_into(sink_rules, records, sink)
+    lines = out.getvalue().splitlines(True)
+    assert [json.loads(line) for line in lines] == list(walk_many(dict_rules, records))
+    assert lines[-1].endswith("\n")
+
+
+def test_events():
+    out = io.StringIO()
+    sink = JsonLinesSink(out)
+    sink.start_node()
+    sink.predicate("p")
+    sink.end_node()
+    sink.start_node()
+    sink.predicate("p")
+    sink.value(1)
+    sink.start_node()
+    sink.end_node()
+    sink.predicate("q")
+    sink.values([2, "3"])
+    sink.values(())
+    sink.values([{}])
+    sink.end_node()
+    sink.close()
+    assert out.getvalue() == '{"p":[]}\n{"p":[1,{}],"q":[2,"3",{}]}\n'
+    sink.start_node()
+    with pytest.raises(ValueError):
+        sink.value(1)
+    with pytest.raises(ValueError):
+        sink.close()
+
+
+def test_errors():
+    out = io.StringIO()
+    errors = []
+    with JsonLinesSink(out) as sink:
+        n = walk_into(
+            {"@id": emit(), "x": lambda a, s, p, os, **opts: 1 / os[0]},
+            [{"@id": "a", "x": [0]}, {"@id": "b", "x": [1]}],
+            sink,
+            errors=errors.append,
+        )
+    assert n == 1
+    assert out.getvalue() == '{"@id":"b"}\n'
+    assert errors == [
+        {
+            "type": "ZeroDivisionError",
+            "message": "division by zero",
+            "path": ["x"],
+            "id": "a",
+        }
+    ]
+    with pytest.raises(Exception) as e:
+        walk_into({"@id": emit()}, [{"y": [1]}], JsonSink(io.StringIO()))
+    assert str(e.value).startswith("LookupError: No rule for 'y'")